@@ -0,0 +1,574 @@
+"""
+Differential fuzzing of the matching engines. Random pattern sets and
+texts (shared prefixes, overlapping and repeated patterns, patterns
+with newlines, unicode, regex metacharacters, empty lines) are searched
+by every engine and compared with a gold standard: the re module (a
+lookahead finds overlapping matches) and a dynamic programming table
+for approximate matching. Every engine is called on the whole text and
+run by StringMatcher on each kind of input: a string, a file (also
+gzip compressed) read in chunks of a few bytes, so that multibyte
+charachters are cut, read ahead by the prefetcher in blocks of a few
+bytes, stdin in small blocks and a file whose results are spilled to
+disk. Lines of files and stdin are matched one by one: no match goes
+past the end of a line. A failing case is shrunk to a small reproducer.
+The time of each engine is added up, so a run is also a smoke benchmark
+of throughput.
+
+    python fuzz_engines.py [--cases N] [--seed S] [--size CHARS]
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import gzip
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+from src.ahoc_automaton import State
+from src.naive_matcher import NaiveStringMatcher
+from src.shift_and import ShiftAndMatcher
+from src.regex_matcher import RegexMatcher
+from src.rabin_karp import RabinKarpMatcher
+from src.approximate_matcher import ApproximateMatcher
+from src.compiled_automaton import CompiledAutomaton
+from src.heavy_hitters import HeavyHitterMatcher
+from src.suffix_array import SuffixArray
+from src.string_matcher import StringMatcher
+
+
+# small alphabets give many overlapping matches, the others unicode
+# (also outside the basic plane), metacharacters of regular expressions
+# and letters whose lowercase is longer ("İ") or depends on the
+# position in the word ("Σ")
+alphabets = [
+    "ab",
+    "abc \n",
+    "aAbB.*+?|()[]{}^$\\ \n",
+    "the cat sat on a mat\n",
+    "äöüß€’日本語😀ab \n",
+    "İiΣσς ab\n"
+]
+
+# longest line of a random text, without its newline
+longest_line = 200
+
+# errors allowed by the approximate engine
+max_errors = 1
+
+
+def compiled_automaton(patterns):
+    return CompiledAutomaton(CompiledAutomaton.compile(patterns))
+
+
+def top_counts(patterns):
+    # every pattern is followed: the counts are exact
+    return HeavyHitterMatcher(patterns, k=len(set(patterns)),
+                              width=max(64, 2 * len(patterns)))
+
+
+def approximate(patterns):
+    return ApproximateMatcher(patterns, max_errors)
+
+
+def whole_text_numpy(patterns):
+    # the text is not made of lines joined in blocks
+    return RabinKarpMatcher(patterns, lines=False)
+
+
+# engines called on the whole text
+engines = {
+    "ahc": State.create_automaton,
+    "naive": NaiveStringMatcher,
+    "shift-and": ShiftAndMatcher,
+    "regex": RegexMatcher,
+    "automaton": compiled_automaton,
+    "top": top_counts,
+    "approximate": approximate
+}
+if RabinKarpMatcher.available():
+    engines["numpy"] = whole_text_numpy
+
+# engines which only count the matches
+count_engines = {"top"}
+
+# options of StringMatcher for the engines run on each input
+engine_options = {
+    "ahc": {},
+    "naive": {"engine": "naive"},
+    "shift-and": {"engine": "shift-and"},
+    "regex": {"engine": "regex"},
+    "automaton": {"automaton": "automaton"},
+    "approximate": {"max_errors": max_errors}
+}
+if RabinKarpMatcher.available():
+    engine_options["numpy"] = {"engine": "numpy"}
+
+# inputs of StringMatcher, all but strings are matched line by line
+inputs = ["string", "file", "gzip", "prefetch", "stdin", "spill"]
+
+
+def random_case(rng, size=2000):
+    """
+    a random text and patterns taken from it (so that they match),
+    from the alphabet, prefixes and extensions of each other
+
+    Returns:
+        - (patterns, text, case_insensitive)
+    """
+    alphabet = rng.choice(alphabets)
+
+    lines = []
+    length = 0
+    target = rng.randint(0, size)
+    while length < target:
+        # empty lines and lines without a newline at the end
+        line = "".join(rng.choice(alphabet) for _ in range(
+            rng.choice([0, 1, 5, 40, longest_line])))
+        lines.append(line.replace("\n", ""))
+        length += len(line) + 1
+    text = "\n".join(lines)
+    if rng.random() < 0.5:
+        text += "\n"
+
+    patterns = []
+    for _ in range(rng.randint(1, 12)):
+        kind = rng.random()
+        if kind < 0.4 and len(text) > 1:
+            # also across the end of a line
+            start = rng.randrange(len(text))
+            pattern = text[start:start + rng.randint(1, 8)]
+        elif kind < 0.7 or not patterns:
+            pattern = "".join(rng.choice(alphabet)
+                              for _ in range(rng.randint(1, 6)))
+        elif kind < 0.8:
+            # shared prefix
+            pattern = rng.choice(patterns)[:rng.randint(1, 4)]
+        elif kind < 0.9:
+            # the same pattern twice
+            pattern = rng.choice(patterns)
+        else:
+            # overlapping: a pattern followed by its own beginning
+            pattern = rng.choice(patterns)
+            pattern += pattern[:rng.randint(1, len(pattern))]
+
+        if pattern:
+            patterns.append(pattern)
+
+    if not patterns:
+        patterns.append(rng.choice(alphabet))
+
+    return patterns, text, rng.random() < 0.3
+
+
+def text_lines(text):
+    # lines with their newline, as read from a file
+    return io.StringIO(text, newline="\n")
+
+
+def approximate_matches(pattern, text, errors):
+    """
+    matches of a pattern with at most errors edits, from a complete
+    dynamic programming table: the best end position of each group of
+    consecutive end positions within the errors, and the shortest
+    substring ending there with that distance
+
+    Returns:
+        - list of (start, distance)
+    """
+    def edit_distance(first, second):
+        row = list(range(len(second) + 1))
+        for i, first_char in enumerate(first, 1):
+            previous, row = row, [i] + [0] * len(second)
+            for j, second_char in enumerate(second, 1):
+                row[j] = min(previous[j] + 1, row[j - 1] + 1,
+                             previous[j - 1] + (first_char != second_char))
+        return row[-1]
+
+    # smallest distance of a substring ending at each position
+    column = list(range(len(pattern) + 1))
+    ends = []
+    in_group = False
+    for j, char in enumerate(text):
+        previous = column
+        column = [0] * (len(pattern) + 1)
+        for i in range(1, len(pattern) + 1):
+            column[i] = min(previous[i] + 1, column[i - 1] + 1,
+                            previous[i - 1] + (pattern[i - 1] != char))
+        distance = column[-1]
+
+        if distance > errors:
+            in_group = False
+        elif not in_group:
+            ends.append((j, distance))
+            in_group = True
+        elif distance < ends[-1][1]:
+            ends[-1] = (j, distance)
+
+    return [(next(start for start in range(j + 1, -1, -1)
+                  if edit_distance(pattern, text[start:j + 1]) == distance),
+             distance) for j, distance in ends]
+
+
+def gold_standard(patterns, text, case_insensitive, lines=False,
+                  errors=None):
+    """
+    overlapping matches of each pattern found by the re module (or
+    the table of approximate_matches), a pattern given twice is
+    reported twice
+
+    Parameters:
+        - lines (bool): the lines are searched one by one
+        - errors (int): edits of approximate matches, None if exact
+
+    Returns:
+        - results (dict): pattern -> sorted indices
+        - counts (dict): pattern -> number of matches
+    """
+    if case_insensitive:
+        patterns = [pattern.lower() for pattern in patterns]
+        text = text.lower()
+
+    segments = [(0, text)]
+    if lines:
+        segments = []
+        start = 0
+        for line in text_lines(text):
+            segments.append((start, line))
+            start += len(line)
+
+    results = {}
+    for pattern in set(patterns):
+        indices = []
+        for start, segment in segments:
+            if errors is None:
+                indices += [start + match.start() for match in re.finditer(
+                    f"(?={re.escape(pattern)})", segment)]
+            else:
+                indices += [(start + index, distance) for index, distance
+                            in approximate_matches(pattern, segment, errors)]
+        if indices:
+            results[pattern] = sorted(indices * patterns.count(pattern))
+
+    return results, {key: len(value) for key, value in results.items()}
+
+
+def sorted_results(results):
+    return {pattern: sorted(indices)
+            for pattern, indices in results.items() if indices}
+
+
+def run_engine(engine, patterns, text, case_insensitive):
+    """
+    search the whole text with an engine
+
+    Returns:
+        - results (dict): pattern -> sorted indices
+        - counts (dict): pattern -> number of matches
+    """
+    # patterns are lowercased by StringMatcher
+    if case_insensitive:
+        patterns = [pattern.lower() for pattern in patterns]
+
+    matcher = engines[engine](patterns)
+    matcher.find_match(text, case_insensitive)
+    return sorted_results(matcher.results), dict(matcher.counts)
+
+
+def run_string_matcher(engine, source, patterns, text, case_insensitive):
+    """
+    run StringMatcher on the text given as a string, a file or stdin,
+    in a temporary directory where the results are saved in json.
+    Files are read in chunks of a few bytes and blocks of stdin are
+    just longer than the longest line (longer lines would be cut).
+    Results spilled to disk have to give the same output as without.
+
+    Returns:
+        - results (dict): pattern -> sorted indices
+        - counts (dict): pattern -> number of matches
+    """
+    options = dict(engine_options[engine])
+    if source == "prefetch":
+        options["prefetch"] = 2
+
+    def search(json_output, spill=False):
+        with redirect_stdout(io.StringIO()) as output:
+            sucher = StringMatcher(
+                list(patterns), list(texts), False, case_insensitive, False,
+                json_output, False, result_memory=1 if spill else None,
+                **options)
+            sucher.chunk_size = 7
+            sucher.block_size = 5
+            if source == "stdin":
+                sucher.block_size = longest_line + 1
+            if spill:
+                sucher.spill.max_indices = 4
+                sucher.spill.check_chars = 1
+            sucher.run()
+        return output.getvalue()
+
+    stdin = sys.stdin
+    directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            if source == "string":
+                # more than one text: never taken for a path or stdin
+                texts = [text, ""]
+            elif source == "stdin":
+                texts = ["-"]
+                sys.stdin = io.TextIOWrapper(
+                    io.BytesIO(text.encode("utf-8")), encoding="utf-8")
+            else:
+                data = text.encode("utf-8")
+                texts = ["text.txt"]
+                if source == "gzip":
+                    data = gzip.compress(data)
+                    texts = ["text.txt.gz"]
+                with open(texts[0], "wb") as text_file:
+                    text_file.write(data)
+
+            search(True)
+            with open("results.json", encoding="utf-8") as json_file:
+                saved = json.load(json_file)
+
+            if source == "spill":
+                if search(False, spill=True) != search(False):
+                    raise AssertionError("the output with results spilled "
+                                         "to disk is not the same")
+        finally:
+            sys.stdin = stdin
+            os.chdir(directory)
+
+    # a single text has results, (index, distance) are saved as lists
+    results = {}
+    for text_results in saved.values():
+        for pattern, indices in text_results.items():
+            results[pattern] = [tuple(index) if isinstance(index, list)
+                                else index for index in indices]
+    results = sorted_results(results)
+    return results, {key: len(value) for key, value in results.items()}
+
+
+def run_suffix_array(patterns, text, case_insensitive):
+    """
+    the suffix array searches the whole text at once
+    """
+    if case_insensitive:
+        patterns = [pattern.lower() for pattern in patterns]
+        text = text.lower()
+
+    results, counts = SuffixArray(text).search(patterns)
+    return sorted_results(results), counts
+
+
+def configurations():
+    """
+    (engine, input) of every search compared with the gold standard,
+    "whole" is the engine called on the whole text
+    """
+    for engine in engines:
+        yield engine, "whole"
+    for engine in engine_options:
+        for source in inputs:
+            yield engine, source
+    yield "suffix-array", "whole"
+
+
+def gold_options(engine, source):
+    """
+    options of the gold standard of a configuration
+
+    Returns:
+        - (lines, errors)
+    """
+    errors = max_errors if engine == "approximate" else None
+    return source not in ("whole", "string"), errors
+
+
+def search(engine, source, patterns, text, case_insensitive):
+    if engine == "suffix-array":
+        return run_suffix_array(patterns, text, case_insensitive)
+    if source == "whole":
+        return run_engine(engine, patterns, text, case_insensitive)
+    return run_string_matcher(engine, source, patterns, text,
+                              case_insensitive)
+
+
+def difference(engine, expected, found):
+    """
+    Returns:
+        - a description of the first difference, None if the
+            results (only the counts for some engines) are the same
+    """
+    expected_results, expected_counts = expected
+    results, counts = found
+
+    if counts != expected_counts:
+        return f"counts {counts} instead of {expected_counts}"
+
+    if engine in count_engines:
+        return None
+
+    for pattern in sorted(set(results) | set(expected_results)):
+        if results.get(pattern) != expected_results.get(pattern):
+            return (f"indices of {pattern!r}: {results.get(pattern)} "
+                    f"instead of {expected_results.get(pattern)}")
+    return None
+
+
+def check(engine, source, case):
+    """
+    Returns:
+        - the difference with the gold standard (None if there is
+            none), an exception of the engine is a difference too
+    """
+    try:
+        found = search(engine, source, *case)
+    except Exception as error:
+        return f"{type(error).__name__}: {error}"
+    return difference(engine, gold_standard(
+        *case, *gold_options(engine, source)), found)
+
+
+def shrink(engine, source, case):
+    """
+    greedy reduction of a failing case: remove patterns, lines,
+    parts of the text and charachters of the patterns as long as
+    the engine still fails
+
+    Returns:
+        - the smallest failing case found
+    """
+    patterns, text, case_insensitive = case
+
+    def fails(patterns, text):
+        return check(engine, source,
+                     (patterns, text, case_insensitive)) is not None
+
+    progress = True
+    while progress:
+        progress = False
+
+        for i in reversed(range(len(patterns))):
+            smaller = patterns[:i] + patterns[i + 1:]
+            if smaller and fails(smaller, text):
+                patterns = smaller
+                progress = True
+
+        # parts of the text, from whole lines down to charachters
+        size = max(1, len(text) // 2)
+        while size:
+            start = 0
+            while start < len(text):
+                smaller = text[:start] + text[start + size:]
+                if fails(patterns, smaller):
+                    text = smaller
+                    progress = True
+                else:
+                    start += size
+            size //= 2
+
+        for i, pattern in enumerate(patterns):
+            for j in reversed(range(len(pattern))):
+                shorter = pattern[:j] + pattern[j + 1:]
+                if not shorter or len(shorter) >= len(patterns[i]):
+                    continue
+                smaller = patterns[:i] + [shorter] + patterns[i + 1:]
+                if fails(smaller, text):
+                    patterns = smaller
+                    progress = True
+
+    return patterns, text, case_insensitive
+
+
+def fuzz(cases=200, seed=0, size=2000, stream=None):
+    """
+    compare every configuration with the gold standard on random cases
+
+    Parameters:
+        - cases (int): number of random cases
+        - seed (int): seed of the random generator (reproducible runs)
+        - size (int): largest text of a case, in charachters
+        - stream (file): where failures are printed, None for silence
+
+    Returns:
+        - failures (list): (engine, source, difference, shrunk case)
+            of the first failure of each configuration
+        - timings (dict): (engine, source) -> seconds of the searches
+        - chars (int): charachters searched by each configuration
+    """
+    rng = random.Random(seed)
+    failures = []
+    failed = set()
+    timings = dict.fromkeys(configurations(), 0)
+    chars = 0
+
+    for _ in range(cases):
+        case = random_case(rng, size)
+        # (lines, errors) -> gold standard
+        expected = {}
+        chars += len(case[1])
+
+        for engine, source in configurations():
+            options = gold_options(engine, source)
+            if options not in expected:
+                expected[options] = gold_standard(*case, *options)
+
+            start = time.perf_counter()
+            try:
+                found = search(engine, source, *case)
+                error = difference(engine, expected[options], found)
+            except Exception as exception:
+                error = f"{type(exception).__name__}: {exception}"
+            timings[engine, source] += time.perf_counter() - start
+
+            if error is None or (engine, source) in failed:
+                continue
+
+            failed.add((engine, source))
+            shrunk = shrink(engine, source, case)
+            failures.append((engine, source,
+                             check(engine, source, shrunk), shrunk))
+
+            if stream is not None:
+                patterns, text, case_insensitive = shrunk
+                print(f"FAILED {engine} ({source}): "
+                      f"{failures[-1][2]}\n\tpatterns={patterns!r} "
+                      f"text={text!r} case_insensitive={case_insensitive}",
+                      file=stream)
+
+    return failures, timings, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="compare the matching engines with a gold standard "
+                    "on random texts")
+    parser.add_argument("--cases", type=int, default=200,
+                        help="number of random cases (default 200)")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the random generator (default 0)")
+    parser.add_argument("--size", type=int, default=2000,
+                        help="largest text of a case, in charachters "
+                             "(default 2000)")
+    args = parser.parse_args()
+
+    failures, timings, chars = fuzz(args.cases, args.seed, args.size,
+                                    sys.stdout)
+
+    print(f"\n{args.cases} cases, {chars} charachters, "
+          f"{len(failures)} failing configuration(s)\n")
+    print(f"{'ENGINE':<14}{'INPUT':<12}{'TIME(s)':<10}CHARS/s")
+    for (engine, source), seconds in timings.items():
+        throughput = chars / seconds if seconds else 0
+        print(f"{engine:<14}{source:<12}{seconds:<10.3f}"
+              f"{throughput:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 import argparse
+import cProfile
+import os
 from src.string_matcher import StringMatcher
 
 
@@ -15,7 +17,7 @@ def main():
                           metavar="PATTERN", action="store", required=True)
 
     help_text = ("text to be searched, can be multiple strings, "
-                 "a single file or a directory")
+                 "a single file, a directory or - for standard input")
     required.add_argument("-t", "--text", help=help_text, metavar="TEXT",
                           nargs="+", action="store", required=True)
 
@@ -30,6 +32,20 @@ def main():
     optional.add_argument("-n", "--naive", help=help_naive,
                           action="store_true")
 
+    help_engine = ("matching algorithm: Aho-Corasick automaton (default), "
+                   "naive, bit parallel Shift-And (fast for few short "
+                   "patterns), regex (one regular expression) or numpy "
+                   "(vectorized Rabin-Karp for large dictionaries, "
+                   "requires numpy)")
+    optional.add_argument("-e", "--engine", help=help_engine, default="ahc",
+                          choices=["ahc", "naive", "shift-and", "regex",
+                                   "numpy"])
+
+    help_errors = ("approximate search: find matches with at most K "
+                   "errors (edit distance)")
+    optional.add_argument("-k", "--max-errors", help=help_errors, type=int,
+                          metavar="K")
+
     help_recursive = "recursively look for all files in TEXT folder"
     optional.add_argument("-r", "--recursive", help=help_recursive,
                           action="store_true")
@@ -41,8 +57,142 @@ def main():
     optional.add_argument("-c", "--counter", help=help_counter,
                           action="store_true")
 
+    help_lines = "print line:column of the matches instead of indeces"
+    optional.add_argument("-l", "--lines", help=help_lines,
+                          action="store_true")
+
+    help_context = "print line:column and the line of each match"
+    optional.add_argument("--context", help=help_context,
+                          action="store_true")
+
+    help_cache = ("save the results of each file in a cache (default "
+                  ".smatcher_cache.sqlite), unchanged files are not "
+                  "searched again")
+    optional.add_argument("--cache", help=help_cache, nargs="?",
+                          const=".smatcher_cache.sqlite", metavar="FILE")
+
+    help_rescan = "search all files again and update the cache"
+    optional.add_argument("--rescan", help=help_rescan, action="store_true")
+
+    help_cache_size = "maximum number of files in the cache (default 10000)"
+    optional.add_argument("--cache-size", help=help_cache_size, type=int,
+                          default=10000, metavar="N")
+
+    help_cache_stats = "print hits, misses and size of the cache on stderr"
+    optional.add_argument("--cache-stats", help=help_cache_stats,
+                          action="store_true")
+
+    help_index = ("trigram index of the files in TEXT, created if it does "
+                  "not exist: only the files which contain the trigrams of "
+                  "a pattern are searched, new and modified files are "
+                  "indexed again")
+    optional.add_argument("--index", help=help_index, metavar="FILE")
+
+    help_suffix_array = ("answer the patterns with a suffix array of the "
+                         "file TEXT, built and saved in FILE on the first "
+                         "run (fast for many queries on one large text)")
+    optional.add_argument("--suffix-array", help=help_suffix_array,
+                          metavar="FILE")
+
+    help_prefetch = ("read the next N files (default 2) in a thread while "
+                     "the current one is searched, long text files are "
+                     "read block by block")
+    optional.add_argument("--prefetch", help=help_prefetch, nargs="?",
+                          type=int, const=2, default=0, metavar="N")
+
+    help_prefetch_memory = ("memory for the blocks read ahead "
+                            "(default 64 MB)")
+    optional.add_argument("--prefetch-memory", help=help_prefetch_memory,
+                          type=int, default=64, metavar="MB")
+
+    help_automaton = ("compile the automaton in FILE (again if the patterns "
+                      "change) and map it in memory: processes searching "
+                      "the same patterns share one copy")
+    optional.add_argument("--automaton", help=help_automaton, metavar="FILE")
+
+    help_result_memory = ("memory for the indices of a file: when they take "
+                          "more than MB megabytes they are moved to a "
+                          "temporary file")
+    optional.add_argument("--result-memory", help=help_result_memory,
+                          type=int, metavar="MB")
+
+    help_top = ("with -c: approximate counts of the K most frequent "
+                "patterns, with fixed memory (for very large pattern sets)")
+    optional.add_argument("--top", help=help_top, type=int, metavar="K")
+
+    help_sketch_width = ("counters in each row of the sketch used by --top, "
+                         "also the number of patterns followed (default "
+                         "4096)")
+    optional.add_argument("--sketch-width", help=help_sketch_width,
+                          type=int, default=4096, metavar="W")
+
+    help_sketch_depth = "rows of the sketch used by --top (default 4)"
+    optional.add_argument("--sketch-depth", help=help_sketch_depth,
+                          type=int, default=4, metavar="D")
+
+    help_stats = ("print timings, throughput and size of the matcher "
+                  "on stderr, as text (default) or json")
+    optional.add_argument("--stats", help=help_stats, nargs="?",
+                          const="text", choices=["text", "json"])
+
+    help_profile = "run the programme with cProfile and save the profile"
+    optional.add_argument("--profile", help=help_profile, metavar="FILE")
+
     args = parser.parse_args()
 
+    if args.max_errors is not None:
+        if args.max_errors < 0:
+            parser.error("--max-errors must not be negative")
+        if args.lines or args.context:
+            parser.error("--max-errors cannot be used with --lines/--context")
+        if args.index is not None:
+            parser.error("--max-errors cannot be used with --index")
+        if args.naive or args.engine != "ahc":
+            # approximate search has its own algorithm
+            parser.error("--max-errors cannot be used with --naive/--engine")
+
+    if args.cache is not None and (args.lines or args.context):
+        parser.error("--cache cannot be used with --lines/--context")
+
+    if args.prefetch < 0 or args.prefetch_memory <= 0:
+        parser.error("--prefetch and --prefetch-memory must be "
+                     "positive numbers")
+
+    if args.automaton is not None and (args.max_errors is not None
+                                       or args.naive
+                                       or args.engine != "ahc"):
+        parser.error("--automaton can only be used with the "
+                     "Aho-Corasick automaton")
+
+    if args.result_memory is not None:
+        if args.result_memory <= 0:
+            parser.error("--result-memory must be a positive number")
+        if (args.json or args.lines or args.context
+                or args.cache is not None):
+            parser.error("--result-memory cannot be used with --json, "
+                         "--lines/--context or --cache")
+
+    if args.top is not None:
+        if not args.counter:
+            parser.error("--top requires --counter")
+        if min(args.top, args.sketch_width, args.sketch_depth) <= 0:
+            parser.error("--top, --sketch-width and --sketch-depth must "
+                         "be positive numbers")
+        if (args.max_errors is not None or args.naive
+                or args.engine != "ahc" or args.automaton is not None
+                or args.cache is not None or args.suffix_array is not None):
+            parser.error("--top can only be used with the Aho-Corasick "
+                         "automaton (without --automaton, --cache or "
+                         "--suffix-array)")
+
+    if args.suffix_array is not None:
+        if len(args.text) != 1 or not os.path.isfile(args.text[0]):
+            parser.error("--suffix-array requires a single file as TEXT")
+        if (args.max_errors is not None or args.lines or args.context
+                or args.cache is not None or args.index is not None):
+            parser.error("--suffix-array cannot be used with --max-errors, "
+                         "--lines/--context, --cache or --index")
+
     # collect arguments
     text = args.text
     pattern = args.pattern
@@ -51,11 +201,43 @@ def main():
     recursive = args.recursive
     json = args.json
     counter = args.counter
+    lines = args.lines
+    context = args.context
+    stats = args.stats
+    engine = args.engine
+    max_errors = args.max_errors
+    cache = args.cache
+    rescan = args.rescan
+    cache_stats = args.cache_stats
+    cache_size = args.cache_size
+    index = args.index
+    suffix_array = args.suffix_array
+    prefetch = args.prefetch
+    prefetch_memory = args.prefetch_memory
+    automaton = args.automaton
+    result_memory = args.result_memory
+    top = args.top
+    sketch_width = args.sketch_width
+    sketch_depth = args.sketch_depth
+
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
 
     # instanciate the matcher and run it
-    sucher = StringMatcher(pattern, text, naive, case, recursive, json, counter)
+    sucher = StringMatcher(pattern, text, naive, case, recursive, json, counter,
+                           lines, context, stats, engine, max_errors, cache,
+                           rescan, cache_stats, cache_size, index,
+                           suffix_array, prefetch, prefetch_memory,
+                           automaton, result_memory, top, sketch_width,
+                           sketch_depth)
     sucher.run()
 
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+
 
 if __name__ == "__main__":
     main()
@@ -1,44 +1,257 @@
+import os
+import tempfile
 import time
+import tracemalloc
 from pathlib import Path
 
 from src.ahoc_automaton import State
 from src.naive_matcher import NaiveStringMatcher
+from src.shift_and import ShiftAndMatcher
+from src.regex_matcher import RegexMatcher
+from src.rabin_karp import RabinKarpMatcher
+from src.string_matcher import StringMatcher
+from src.suffix_array import SuffixArray
+from src.compiled_automaton import CompiledAutomaton
+from src.heavy_hitters import HeavyHitterMatcher
+
+
+def run_matcher(matcher, filename):
+    """
+    search a whole file line by line with a matcher
+
+    Returns:
+        - the results of the matcher
+    """
+    with open(filename, "r") as f:
+        text = f
+        # same blocks of lines used by StringMatcher
+        if hasattr(matcher, "block_size"):
+            text = StringMatcher.blocks(f, matcher.block_size)
+        for line in text:
+            matcher.find_match(line)
+    return matcher.results
 
 
 def speed(patterns, filename):
     """
     given a list of patterns and a file this function calculates the time
     needed for each algorithm to find all the patterns in the text.
-    Results are then compared and if both pattern matcher yield the same
+    Results are then compared and if all pattern matchers yield the same
     result, the function prints out the time it took for each algorithm
     to find all results and the time increase in percentage from the
     fastest to the slowest algorithm
     """
+    algorithms = {
+        "AHC": State.create_automaton,
+        "NAIVE": NaiveStringMatcher,
+        "SHIFT-AND": ShiftAndMatcher,
+        "REGEX": RegexMatcher
+    }
+
+    times = {}
+    results = []
+    for name, create in algorithms.items():
+        start = time.time()
+        matcher = create(patterns)
+        results.append(run_matcher(matcher, filename))
+        times[name] = time.time() - start
+
+    for result in results[1:]:
+        assert result == results[0]
 
-    # Aho-Corasick
-    start_aho = time.time()
-    a = State.create_automaton(patterns)
+    min_n = min(times.values())
+    max_n = max(times.values())
+    inc = ((max_n - min_n)/min_n)*100
+    fastest = min(times, key=times.get)
+
+    timings = "".join(f"{name}: {t:<8.3f}" for name, t in times.items())
+    print(f"PATTERNS: {len(patterns):<3}- TIME(s): {timings}"
+          f"FASTEST: {fastest:<10}DIFF: {inc:.2f}%")
+
+
+def dictionary_speed(filename, sizes=(10, 100, 1000, 10000)):
+    """
+    compare the automaton, the regular expression and (if numpy is
+    installed) the vectorized Rabin-Karp with larger dictionaries
+    (words taken from the text itself) to find out from how many
+    patterns on the automaton is faster than the other algorithms
+    """
+    words = []
+    seen = set()
     with open(filename, "r") as f:
         for line in f:
-            a.find_match(line)
-    t_aho = time.time() - start_aho
+            for word in line.split():
+                if len(word) > 3 and word not in seen:
+                    seen.add(word)
+                    words.append(word)
+
+    for size in sizes:
+        patterns = words[:size]
+
+        start = time.time()
+        a = run_matcher(State.create_automaton(patterns), filename)
+        t_aho = time.time() - start
+
+        start = time.time()
+        r = run_matcher(RegexMatcher(patterns), filename)
+        t_regex = time.time() - start
+
+        assert a == r
+
+        numpy_time = ""
+        if RabinKarpMatcher.available():
+            start = time.time()
+            n = run_matcher(RabinKarpMatcher(patterns), filename)
+            t_numpy = time.time() - start
+
+            assert a == n
+            numpy_time = f"NUMPY: {t_numpy:<8.3f}"
+
+        print(f"PATTERNS: {len(patterns):<6}- TIME(s): AHC: {t_aho:<8.3f}"
+              f"REGEX: {t_regex:<8.3f}{numpy_time}")
+
+
+def output_speed(filename, patterns=("e", "the", " ")):
+    """
+    time the output of a file with millions of matches: the results
+    are written to os.devnull by StringMatcher (formatted in chunks)
+    and compared with building the whole output string first
+    """
+    sucher = StringMatcher(list(patterns), [str(filename)], False, False,
+                           False, False, False)
+
+    with open(os.devnull, "w") as devnull:
+        sucher.out = devnull
+        sucher.run()
+
+    t_stream = sucher.stats.timings["output"]
+
+    # one string for the whole output, built twice as the old
+    # output did (once to check if it was empty, once to print it)
+    matcher = run_matcher(State.create_automaton(list(patterns)), filename)
+    hits = sum(len(indices) for indices in matcher.values())
+    start = time.time()
+    for _ in range(2):
+        to_print = ""
+        for key in matcher:
+            matches = ", ".join([str(i) for i in matcher[key]])
+            to_print += f"{key:<5}{matches}\n"
+    with open(os.devnull, "w") as devnull:
+        print(to_print[:-1], file=devnull)
+    t_string = time.time() - start
+
+    print(f"MATCHES: {hits:<10}- TIME(s): STREAM: {t_stream:<8.3f}"
+          f"STRING: {t_string:<8.3f}")
 
-    # naive
-    start_naive = time.time()
-    n = NaiveStringMatcher(patterns)
+
+def suffix_array_speed(filename, batches=5, batch_size=1000):
+    """
+    count several batches of patterns (words of the text) in the
+    same text: the automaton is built and the text scanned again for
+    each batch, the suffix array is built once and searched
+    """
     with open(filename, "r") as f:
-        for line in f:
-            n.find_match(line)
-    t_naive = time.time() - start_naive
+        text = f.read()
+    words = list(dict.fromkeys(text.split()))
 
-    assert n.results == a.results
+    start = time.time()
+    index = SuffixArray(text)
+    t_build = time.time() - start
+    t_aho = 0
+    t_query = 0
 
-    min_n = min(t_aho, t_naive)
-    max_n = max(t_aho, t_naive)
-    inc = ((max_n - min_n)/min_n)*100
+    for batch in range(batches):
+        patterns = words[batch * batch_size:(batch + 1) * batch_size]
+
+        start = time.time()
+        automaton = State.create_automaton(patterns)
+        run_matcher(automaton, filename)
+        t_aho += time.time() - start
+
+        start = time.time()
+        _, counts = index.search(patterns, counter=True)
+        t_query += time.time() - start
+
+        assert counts == automaton.counts
+
+    print(f"BATCHES: {batches} x {batch_size} PATTERNS - TIME(s): "
+          f"AHC: {t_aho:<8.3f}SUFFIX ARRAY: {t_build + t_query:<8.3f}"
+          f"(BUILD: {t_build:.3f} QUERIES: {t_query:.3f})")
+
+
+def compiled_automaton_speed(filename, size=10000):
+    """
+    memory taken by the automaton in each process (the trie of State
+    objects against the compiled automaton, which is mapped from a file
+    and shared by all processes) and time of a scan with each of them
+    """
+    with open(filename, "r") as f:
+        words = list(dict.fromkeys(f.read().split()))[:size]
+
+    tracemalloc.start()
+    automaton = State.create_automaton(words)
+    trie_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
 
-    print(f"PATTERNS: {len(patterns):<3}- TIME(s): AHC: {t_aho:<8.3f}"
-          f"NAIVE: {t_naive:<8.3f}DIFF: {inc:.2f}%")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        compiled = CompiledAutomaton.load(os.path.join(tmp_dir, "automaton"),
+                                          words)
+        buffer_memory = compiled.statistics()["buffer bytes"]
+
+        start = time.time()
+        a = run_matcher(automaton, filename)
+        t_aho = time.time() - start
+
+        start = time.time()
+        c = run_matcher(compiled, filename)
+        t_compiled = time.time() - start
+
+        assert a == c
+        compiled.close()
+
+    print(f"PATTERNS: {len(words):<6}- MEMORY(MB): "
+          f"TRIE: {trie_memory / 2**20:<8.1f}"
+          f"COMPILED: {buffer_memory / 2**20:<8.1f}(SHARED) - TIME(s): "
+          f"AHC: {t_aho:<8.3f}COMPILED: {t_compiled:.3f}")
+
+
+def heavy_hitters_speed(filename, k=10):
+    """
+    count all the words of the text (exact counts of the automaton
+    against the sketch of the K most frequent ones): memory taken by
+    the counts while scanning, time and difference of the top K counts
+    """
+    with open(filename, "r") as f:
+        words = list(dict.fromkeys(f.read().split()))
+
+    measures = {}
+    for name, create in [("EXACT", State.create_automaton),
+                         ("SKETCH", lambda p: HeavyHitterMatcher(p, k))]:
+        matcher = create(words)
+        start = time.time()
+        run_matcher(matcher, filename)
+        seconds = time.time() - start
+
+        # again, tracing the memory slows down the scan
+        matcher.reset()
+        tracemalloc.start()
+        run_matcher(matcher, filename)
+        memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        measures[name] = (seconds, memory, matcher.counts)
+
+    exact = measures["EXACT"][2]
+    top = sorted(exact, key=exact.get, reverse=True)[:k]
+    counts = measures["SKETCH"][2]
+    found = len(set(top) & set(counts))
+    error = max(counts[word] - exact[word] for word in counts)
+
+    timings = "".join(f"{name}: {seconds:<8.3f}"
+                      for name, (seconds, _, _) in measures.items())
+    memory = "".join(f"{name}: {memory / 2**20:<8.1f}"
+                     for name, (_, memory, _) in measures.items())
+    print(f"PATTERNS: {len(words):<6}- TIME(s): {timings}- MEMORY(MB): "
+          f"{memory}- TOP {k}: {found} FOUND, MAX ERROR {error}")
 
 
 def main():
@@ -84,6 +297,12 @@ def main():
     for limit in n:
         speed(patterns[:limit], filename)
 
+    dictionary_speed(filename)
+    output_speed(filename)
+    suffix_array_speed(filename)
+    compiled_automaton_speed(filename)
+    heavy_hitters_speed(filename)
+
 
 if __name__ == "__main__":
     main()
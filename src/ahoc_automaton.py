@@ -3,6 +3,10 @@ from collections import deque
 
 class State:
 
+    # fail links followed by find_match, only recorded (on the root)
+    # when it is set to a number, see Stats.watch
+    fail_count = None
+
     def __init__(self, symbol=None):
         self.children = {}
         self.root = False
@@ -36,6 +40,14 @@ class State:
         self.__counter = 0
         self.counts = {}
 
+    def clear_results(self):
+        """
+        This function deletes only the results, counts and the
+        counter are kept - used to stream a long text block by block
+        without keeping every index in memory.
+        """
+        self.results = {}
+
     def traverse(self, states=None):
         """
         a recursive function to traverse the
@@ -165,12 +177,14 @@ class State:
 
         current_state = self
         root = self
+        traversals = 0
 
         for i, char in enumerate(line):
             # if no new state --> follow fail links
             while (current_state.find_next_state(char) is None
                    and current_state.root is False):
                 current_state = current_state.fail
+                traversals += 1
 
             # go to the next state
             current_state = current_state.find_next_state(char)
@@ -193,6 +207,34 @@ class State:
                     self.counts[pattern] += 1
 
         self.__counter += len(line)
+        if self.fail_count is not None:
+            self.fail_count += traversals
+
+    def statistics(self):
+        """
+        size of the automaton
+
+        Returns:
+            - statistics (dict): number of states, of transitions
+                and average length of the output of the states
+        """
+        states = 0
+        transitions = 0
+        outputs = 0
+
+        queue = deque([self])
+        while queue:
+            state = queue.popleft()
+            states += 1
+            transitions += len(state.children)
+            outputs += len(state.output)
+            queue.extend(state.children.values())
+
+        return {
+            "states": states,
+            "transitions": transitions,
+            "average output": outputs / states
+        }
 
     @classmethod
     def create_automaton(cls, string_list):
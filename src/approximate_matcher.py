@@ -0,0 +1,288 @@
+from src.ahoc_automaton import State
+
+
+class ApproximateMatcher:
+
+    def __init__(self, patterns, max_errors, min_piece=3):
+        self.patterns = patterns
+        self.max_errors = max_errors
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+        # bit mask of the positions of each charachter in each pattern
+        self.__peq = {pattern: self.char_masks(pattern)
+                      for pattern in patterns}
+        # pigeonhole filter: piece -> list of (pattern, offset in pattern)
+        self.pieces = {}
+        self.scanned = []
+        self.split_patterns(min_piece)
+        self.filter = None
+        if self.pieces:
+            self.filter = State.create_automaton(list(self.pieces))
+
+    def reset(self):
+        """
+        This function delets results, counts and the counter.
+        Only the patterns are kept - used to search the same
+        patterns in another text
+        """
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+
+    def clear_results(self):
+        """
+        This function deletes only the results, counts and the
+        counter are kept - used to stream a long text block by block
+        without keeping every index in memory.
+        """
+        self.results = {}
+
+    @staticmethod
+    def char_masks(pattern):
+        peq = {}
+        for i, char in enumerate(pattern):
+            peq[char] = peq.get(char, 0) | 1 << i
+        return peq
+
+    def split_patterns(self, min_piece):
+        """
+        a match with at most k errors contains at least one of k+1
+        pieces of the pattern without errors (pigeonhole principle).
+        Patterns which can be split in pieces of at least min_piece
+        charachters are filtered with an automaton of the pieces,
+        the others are scanned completely.
+        """
+        parts = self.max_errors + 1
+
+        for pattern in self.patterns:
+            length = len(pattern) // parts
+            if length < min_piece:
+                self.scanned.append(pattern)
+                continue
+
+            # the first pieces take the remaining charachters
+            longer = len(pattern) % parts
+            offset = 0
+            for i in range(parts):
+                end = offset + length + (i < longer)
+                piece = pattern[offset:end]
+                self.pieces.setdefault(piece, []).append((pattern, offset))
+                offset = end
+
+    def distances(self, pattern, line, start, end):
+        """
+        Myers' bit parallel algorithm: for each position of the line
+        the smallest edit distance between the pattern and a substring
+        ending at that position. The columns of the dynamic programming
+        table are encoded as vertical positive and negative deltas.
+
+        Parameters:
+            - pattern (string): the pattern
+            - line (string): the text
+            - start, end (int): first and last position to report
+
+        Returns:
+            - generator of (position, distance)
+        """
+        peq = self.__peq[pattern]
+        length = len(pattern)
+        mask = (1 << length) - 1
+        high = 1 << (length - 1)
+        positive = mask
+        negative = 0
+        score = length
+
+        # an alignment is never longer than the pattern plus the errors
+        first = max(0, start - length - self.max_errors)
+
+        for j in range(first, end + 1):
+            eq = peq.get(line[j], 0)
+            xv = eq | negative
+            xh = (((eq & positive) + positive) ^ positive) | eq
+            ph = negative | (~(xh | positive) & mask)
+            mh = positive & xh
+
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+
+            ph = (ph << 1) & mask
+            mh = (mh << 1) & mask
+            positive = mh | (~(xv | ph) & mask)
+            negative = ph & xv
+
+            if j >= start:
+                yield j, score
+
+    @staticmethod
+    def alignment_start(pattern, line, end, max_errors):
+        """
+        find where the best alignment of the pattern ending at end
+        begins, with a small dynamic programming table over the
+        reversed pattern and text (the shortest alignment wins)
+        """
+        first = max(0, end - len(pattern) - max_errors + 1)
+        window = line[first:end + 1][::-1]
+        reverse = pattern[::-1]
+
+        # column of the table for the empty window prefix
+        column = list(range(len(reverse) + 1))
+        best, best_length = column[-1], 0
+
+        for j, char in enumerate(window, 1):
+            previous = column
+            column = [0] * (len(reverse) + 1)
+            column[0] = j
+            for i, pattern_char in enumerate(reverse, 1):
+                column[i] = min(previous[i] + 1, column[i - 1] + 1,
+                                previous[i - 1] + (pattern_char != char))
+            if column[-1] < best:
+                best, best_length = column[-1], j
+
+        return end - best_length + 1
+
+    def verify(self, pattern, line, ranges):
+        """
+        compute the distances at the end positions in ranges, group
+        consecutive positions within the errors and keep the best of
+        each group as one match
+
+        Returns:
+            - list of (start, distance)
+        """
+        matches = []
+
+        for start, end in ranges:
+            group = None
+            for j, score in self.distances(pattern, line, start, end):
+                if score <= self.max_errors:
+                    if group is None or score < group[1]:
+                        group = (j, score)
+                    continue
+
+                if group is not None:
+                    matches.append(group)
+                    group = None
+
+            if group is not None:
+                matches.append(group)
+
+        return [(self.alignment_start(pattern, line, j, score), score)
+                for j, score in matches]
+
+    def candidate_ranges(self, line):
+        """
+        run the automaton of the pieces over the line: each piece
+        found gives a range of positions where a match containing
+        it can end. Overlapping and adjacent ranges are merged.
+
+        Returns:
+            - ranges (dict): pattern -> list of (first, last) end positions
+        """
+        self.filter.reset()
+        self.filter.find_match(line)
+        last_position = len(line) - 1
+
+        ranges = {}
+        for piece, positions in self.filter.results.items():
+            for pattern, offset in self.pieces[piece]:
+                end = len(pattern) - 1 - offset
+                for position in positions:
+                    ranges.setdefault(pattern, []).append(
+                        (max(0, position + end - self.max_errors),
+                         min(last_position,
+                             position + end + self.max_errors)))
+
+        for pattern in ranges:
+            merged = []
+            for first, last in sorted(ranges[pattern]):
+                if merged and first <= merged[-1][1] + 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+                else:
+                    merged.append((first, last))
+            ranges[pattern] = merged
+
+        return ranges
+
+    def find_match(self, line, case_insensitive=False):
+        """
+        find all substrings of the line with an edit distance of at
+        most max_errors from a pattern. Long patterns are verified only
+        around the pieces found by the filter automaton, short patterns
+        are scanned with the bit parallel algorithm over the whole line.
+
+        Parameters:
+            -line (string): the text to be searched for matches
+            -case_insentitive (bool): standard = False, if true,
+                the matching algorithm ignores case differences
+                in line and search patterns
+
+        Returns:
+            -void (saves (index, distance) where the matches begin in
+                   self__results[pattern], index is of type integer)
+        """
+        if case_insensitive:
+            line = line.lower()
+
+        if not line:
+            return
+
+        ranges = {}
+        if self.filter is not None:
+            ranges = self.candidate_ranges(line)
+
+        for pattern in self.scanned:
+            ranges[pattern] = [(0, len(line) - 1)]
+
+        # keep the order of the patterns
+        for pattern in self.patterns:
+            if pattern not in ranges:
+                continue
+
+            for start, distance in self.verify(pattern, line,
+                                               ranges[pattern]):
+                if pattern not in self.results:
+                    self.results[pattern] = []
+
+                if pattern not in self.counts:
+                    self.counts[pattern] = 0
+
+                # add counter to start (for multiline input)
+                self.results[pattern].append((start + self.__counter,
+                                              distance))
+                self.counts[pattern] += 1
+
+        self.__counter += len(line)
+
+    def statistics(self):
+        """
+        size of the matcher
+
+        Returns:
+            - statistics (dict): number of patterns, of patterns filtered
+                by pieces and of states of the filter automaton
+        """
+        states = 0
+        if self.filter is not None:
+            states = self.filter.statistics()["states"]
+
+        return {
+            "patterns": len(self.patterns),
+            "filtered patterns": len(self.patterns) - len(self.scanned),
+            "states": states
+        }
+
+
+if __name__ == "__main__":
+    text = "The night is drak and full of terors."
+    patterns = ["the night is dark", "terrors", "full"]
+
+    s = ApproximateMatcher(patterns, 2)
+    s.find_match(text, case_insensitive=True)
+
+    print(f"Text: {text}")
+    print(f"We want to find these patterns with at most 2 errors: {patterns}")
+    for key in s.results:
+        print(f"{key:<20}{s.results[key]}")
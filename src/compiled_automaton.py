@@ -0,0 +1,358 @@
+"""
+CompiledAutomaton is the Aho-Corasick automaton flattened in arrays
+of integers: sorted transitions of each state, fail links, dictionary
+links and outputs, all in one buffer. The buffer can be published in
+shared memory or saved in a file which is mapped in memory, the
+matchers of several processes then read the same pages instead of
+building (or unpickling) their own copy of the trie.
+"""
+
+from array import array
+from bisect import bisect_left
+from collections import deque
+import hashlib
+import json
+import mmap
+import os
+
+from multiprocessing import shared_memory
+
+from src.ahoc_automaton import State
+
+
+class CompiledAutomaton:
+
+    magic = b"SMAC1\x00\x00\x00"
+    # arrays of the buffer after the header, in this order
+    arrays = ["edge_start", "edge_chars", "edge_targets", "fail",
+              "output_link", "output_start", "output_ids", "pattern_start"]
+
+    # fail links followed by find_match, only recorded when it is
+    # set to a number, see Stats.watch
+    fail_count = None
+
+    def __init__(self, buffer, owner=None):
+        """
+        read the arrays of a compiled automaton without copying them
+
+        Parameters:
+            - buffer (buffer): bytes, shared memory or a memory map
+            - owner (object): the shared memory or the memory map,
+                closed by close()
+        """
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+        self.owner = owner
+        self.buffer = memoryview(buffer)
+
+        if bytes(self.buffer[:8]) != self.magic:
+            raise ValueError("not a compiled automaton")
+        self.digest = bytes(self.buffer[8:40])
+
+        header = self.buffer[40:60].cast("i")
+        states, edges, outputs, patterns, text_size = header.tolist()
+        header.release()
+        sizes = [states + 1, edges, edges, states, states, states + 1,
+                 outputs, patterns + 1]
+
+        self.views = []
+        offset = 60
+        for name, size in zip(self.arrays, sizes):
+            view = self.buffer[offset:offset + 4 * size].cast("i")
+            setattr(self, name, view)
+            self.views.append(view)
+            offset += 4 * size
+
+        text = bytes(self.buffer[offset:offset + text_size]).decode(
+            "utf-8", "surrogatepass")
+        self.patterns = [text[self.pattern_start[i]:self.pattern_start[i + 1]]
+                         for i in range(patterns)]
+
+    def reset(self):
+        """
+        This function delets results, counts and the counter.
+        Only the patterns are kept - used to search the same
+        patterns in another text
+        """
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+
+    def clear_results(self):
+        """
+        This function deletes only the results, counts and the
+        counter are kept - used to stream a long text block by block
+        without keeping every index in memory.
+        """
+        self.results = {}
+
+    @staticmethod
+    def fingerprint(patterns):
+        return hashlib.sha256(json.dumps(patterns).encode("utf-8")).digest()
+
+    @classmethod
+    def compile(cls, patterns):
+        """
+        build the automaton with State and flatten it: states are
+        numbered breadth first (root = 0), the transitions of each
+        state are sorted by charachter. A state only keeps its own
+        patterns and a link to the next state with an output on its
+        fail chain, instead of a copy of all the outputs.
+
+        Parameters:
+            - patterns (list): the patterns
+
+        Returns:
+            - buffer (bytes): header and arrays of the automaton
+        """
+        root = State.create_automaton(patterns)
+
+        numbers = {id(root): 0}
+        states = [root]
+        queue = deque([root])
+        while queue:
+            state = queue.popleft()
+            for char in sorted(state.children):
+                child = state.children[char]
+                numbers[id(child)] = len(states)
+                states.append(child)
+                queue.append(child)
+
+        distinct = list(dict.fromkeys(patterns))
+        pattern_ids = {pattern: i for i, pattern in enumerate(distinct)}
+
+        data = {name: array("i") for name in cls.arrays}
+        data["edge_start"].append(0)
+        data["output_start"].append(0)
+
+        for state in states:
+            for char in sorted(state.children):
+                data["edge_chars"].append(ord(char))
+                data["edge_targets"].append(numbers[id(state.children[char])])
+            data["edge_start"].append(len(data["edge_chars"]))
+
+            fail = state.fail if state is not root else root
+            data["fail"].append(numbers[id(fail)])
+
+            # the output of a state is its own patterns followed
+            # by the output of its fail state
+            own = state.output
+            if state is not root:
+                own = state.output[:len(state.output) - len(fail.output)]
+            for pattern in own:
+                data["output_ids"].append(pattern_ids[pattern])
+            data["output_start"].append(len(data["output_ids"]))
+
+            # -1: no other state with an output
+            link = fail
+            while link is not root and len(link.output) == len(
+                    link.fail.output):
+                link = link.fail
+            if state is root or (link is root and not root.output):
+                data["output_link"].append(-1)
+            else:
+                data["output_link"].append(numbers[id(link)])
+
+        data["pattern_start"].append(0)
+        length = 0
+        for pattern in distinct:
+            length += len(pattern)
+            data["pattern_start"].append(length)
+        # lone surrogates (read from invalid utf-8) are kept as they are
+        text = "".join(distinct).encode("utf-8", "surrogatepass")
+
+        header = array("i", [len(states), len(data["edge_chars"]),
+                             len(data["output_ids"]), len(distinct),
+                             len(text)])
+        return (cls.magic + cls.fingerprint(patterns) + header.tobytes()
+                + b"".join(data[name].tobytes() for name in cls.arrays)
+                + text)
+
+    @classmethod
+    def publish(cls, patterns, name=None):
+        """
+        compile the automaton in a new block of shared memory,
+        other processes attach to it with its name
+
+        Returns:
+            - shared memory (SharedMemory): the creator has to close
+                and unlink it when the workers are done
+        """
+        buffer = cls.compile(patterns)
+        shared = shared_memory.SharedMemory(name=name, create=True,
+                                            size=len(buffer))
+        shared.buf[:len(buffer)] = buffer
+        return shared
+
+    @classmethod
+    def attach(cls, name):
+        """
+        matcher over an automaton published in shared memory
+        """
+        try:
+            shared = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # before python 3.13 the memory is tracked by the resource
+            # tracker of the creator (shared by its worker processes)
+            shared = shared_memory.SharedMemory(name=name)
+        return cls(shared.buf, shared)
+
+    @classmethod
+    def load(cls, path, patterns):
+        """
+        map a compiled automaton saved in a file, the file is compiled
+        again if it does not exist or has other patterns. The pages are
+        shared by all the processes which map the same file.
+
+        Returns:
+            - the matcher (CompiledAutomaton)
+        """
+        fingerprint = cls.fingerprint(patterns)
+        current = None
+        if os.path.isfile(path):
+            with open(path, "rb") as automaton_file:
+                current = automaton_file.read(40)
+
+        if current != cls.magic + fingerprint:
+            # write and rename: processes which mapped the old
+            # file keep reading it
+            temporary = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(temporary, "wb") as automaton_file:
+                    automaton_file.write(cls.compile(patterns))
+                os.replace(temporary, path)
+            finally:
+                # the temporary file is left only if something failed
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+
+        with open(path, "rb") as automaton_file:
+            mapped = mmap.mmap(automaton_file.fileno(), 0,
+                               access=mmap.ACCESS_READ)
+        return cls(mapped, mapped)
+
+    def close(self):
+        """
+        release the views of the buffer and close the shared memory
+        or the memory map (the creator still has to unlink it)
+        """
+        for view in self.views:
+            view.release()
+        self.views = []
+        self.buffer.release()
+        if self.owner is not None:
+            self.owner.close()
+            self.owner = None
+
+    def find_match(self, line, case_insensitive=False):
+        """
+        same algorithm and same results as State.find_match, on the
+        arrays. The output of a state is its own patterns followed by
+        the ones of the states on its chain of dictionary links.
+
+        Parameters:
+            -line (string): the text to be searched for matches
+            -case_insentitive (bool): standard = False, if true,
+                the matching algorithm ignores case differences
+                in line and search patterns
+
+        Returns:
+            -void (saves the index where the matches begins in
+                   self__results[pattern], index is of type integer)
+        """
+        if case_insensitive:
+            line = line.lower()
+
+        edge_start = self.edge_start
+        edge_chars = self.edge_chars
+        edge_targets = self.edge_targets
+        fail = self.fail
+        output_start = self.output_start
+        output_ids = self.output_ids
+        output_link = self.output_link
+        patterns = self.patterns
+        state = 0
+        traversals = 0
+
+        for i, char in enumerate(line):
+            code = ord(char)
+            # follow the transition of the charachter (binary search in
+            # the sorted transitions of the state) or the fail links
+            while True:
+                first = edge_start[state]
+                last = edge_start[state + 1]
+                j = bisect_left(edge_chars, code, first, last)
+                if j < last and edge_chars[j] == code:
+                    state = edge_targets[j]
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+                traversals += 1
+
+            # the root is only reached without a transition
+            output = state if state else -1
+            while output >= 0:
+                for j in range(output_start[output],
+                               output_start[output + 1]):
+                    pattern = patterns[output_ids[j]]
+                    if pattern not in self.results:
+                        self.results[pattern] = []
+
+                    if pattern not in self.counts:
+                        self.counts[pattern] = 0
+                    # add counter to i (for multiline input)
+                    it = i + self.__counter
+                    self.results[pattern].append(it - len(pattern) + 1)
+                    self.counts[pattern] += 1
+                output = output_link[output]
+
+        self.__counter += len(line)
+        if self.fail_count is not None:
+            self.fail_count += traversals
+
+    def statistics(self):
+        """
+        size of the automaton
+
+        Returns:
+            - statistics (dict): number of states, of transitions
+                and size of the buffer
+        """
+        return {
+            "states": len(self.fail),
+            "transitions": len(self.edge_chars),
+            "buffer bytes": len(self.buffer)
+        }
+
+
+def count_worker(name, text):
+    # attach to the published automaton, nothing is copied
+    matcher = CompiledAutomaton.attach(name)
+    matcher.find_match(text)
+    counts = matcher.counts
+    matcher.close()
+    return counts
+
+
+if __name__ == "__main__":
+    from multiprocessing import Pool
+
+    texts = ["ushers and his heroes", "she sells sea shells",
+             "hers is the shore"]
+    patterns = ["he", "she", "his", "hers", "shell"]
+
+    shared = CompiledAutomaton.publish(patterns)
+    print(f"Automaton of {patterns} published in {shared.name} "
+          f"({shared.size} bytes)")
+
+    with Pool(len(texts)) as pool:
+        counts = pool.starmap(count_worker,
+                              [(shared.name, text) for text in texts])
+
+    for text, count in zip(texts, counts):
+        print(f"{text:<25}{count}")
+
+    shared.close()
+    shared.unlink()
@@ -0,0 +1,197 @@
+"""
+FileReader hides the format of a file from the matcher.
+Plain text files, compressed files (gzip, bz2, xz) and archives
+(zip, epub, tar) are all opened as a sequence of members, each
+member is a binary stream which is decompressed chunk by chunk
+while the matcher reads it, without extracting anything to disk.
+"""
+
+import bz2
+import codecs
+import gzip
+import io
+import lzma
+import tarfile
+import zipfile
+
+
+class FileReader:
+
+    # magic numbers of the supported single stream compressions
+    compressions = {
+        b"\x1f\x8b": gzip.open,
+        b"BZh": bz2.open,
+        b"\xfd7zXZ\x00": lzma.open
+    }
+
+    def __init__(self, filepath, chunk_size=65536, sniff_size=4096,
+                 source=None, file_format=None):
+        self.filepath = filepath
+        # the content of the file already read (a binary stream), the
+        # format is detected from it (it must be seekable) if not given
+        self.source = source
+        self.chunk_size = chunk_size
+        self.sniff_size = sniff_size
+        self.file_format = file_format
+        if file_format is None:
+            self.file_format = self.detect_format()
+
+    @staticmethod
+    def is_binary(chunk, max_invalid=0.1):
+        """
+        decide if a block of bytes belongs to a binary file
+        (pdf, images...) which should not be searched.
+        A block is binary if it contains a NUL byte or
+        if too many bytes are not valid UTF-8.
+
+        Parameters:
+            - chunk (bytes): the first bytes of a file
+            - max_invalid (float): highest ratio of undecodable
+                characters for a text file
+
+        Returns:
+            - True if the block looks binary, False otherwise
+        """
+        if b"\x00" in chunk:
+            return True
+
+        # incremental decoder to ignore a multibyte char cut at the end
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        decoded = decoder.decode(chunk, final=False)
+        if not decoded:
+            return False
+
+        return decoded.count("\ufffd") / len(decoded) > max_invalid
+
+    def detect_format(self):
+        """
+        detect the format of the file from its magic numbers
+        (the extension is not trusted), the file is only opened
+        if its content was not given
+
+        Returns:
+            - format (string): zip, tar, one of the compressions
+                or text for every other file
+        """
+        if self.source is not None:
+            return self.stream_format(self.source)
+
+        with open(self.filepath, "rb") as magic_file:
+            return self.stream_format(magic_file)
+
+    @classmethod
+    def stream_format(cls, stream):
+        """
+        format of a seekable binary stream, which is rewound
+        """
+        try:
+            if zipfile.is_zipfile(stream):
+                return "zip"
+
+            stream.seek(0)
+            header = stream.read(262)
+
+            # uncompressed tar archive
+            if header[257:262] == b"ustar":
+                return "tar"
+
+            for magic in cls.compressions:
+                if header.startswith(magic):
+                    # a compressed tar is still read member by member
+                    stream.seek(0)
+                    if tarfile.is_tarfile(stream):
+                        return "tar"
+                    return magic
+
+            return "text"
+        finally:
+            stream.seek(0)
+
+    def members(self):
+        """
+        generator over the members of the file, a plain or
+        compressed file only has one member without name
+
+        Returns:
+            - (member, stream): the name of the member (None for
+                single files) and a buffered binary stream
+        """
+        target = self.filepath
+        if self.source is not None:
+            target = self.source
+
+        if self.file_format == "zip":
+            with zipfile.ZipFile(target) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    with archive.open(info) as stream:
+                        yield info.filename, self.buffer(stream)
+
+        elif self.file_format == "tar":
+            # members are decompressed one after the other while
+            # iterating, the archive is never read backwards
+            with tarfile.open(self.filepath, "r:*",
+                              fileobj=self.source) as archive:
+                for info in archive:
+                    if not info.isfile():
+                        continue
+                    stream = archive.extractfile(info)
+                    yield info.name, self.buffer(stream)
+
+        elif self.file_format in self.compressions:
+            opener = self.compressions[self.file_format]
+            stream = self.buffer(opener(target, "rb"))
+            try:
+                stream.peek(1)
+            except (OSError, EOFError, lzma.LZMAError):
+                # a text file which begins with the magic number:
+                # it is read as it is
+                stream.close()
+                if self.source is not None:
+                    self.source.seek(0)
+                self.file_format = "text"
+                yield from self.members()
+                return
+
+            with stream:
+                yield None, stream
+
+        elif self.source is not None:
+            with self.buffer(self.source) as stream:
+                yield None, stream
+
+        else:
+            with open(self.filepath, "rb", self.chunk_size) as stream:
+                yield None, stream
+
+    def buffer(self, stream):
+        return io.BufferedReader(stream, self.chunk_size)
+
+    def sniff(self, stream):
+        """
+        look at the first bytes of a member without consuming them
+
+        Parameters:
+            - stream (BufferedReader): a member returned by self.members
+
+        Returns:
+            - True if the member is binary, False otherwise
+        """
+        return self.is_binary(stream.peek(self.sniff_size)[:self.sniff_size])
+
+    def text_members(self):
+        """
+        generator over the text members of the file, binary
+        members are only reported so that they can be skipped
+
+        Returns:
+            - (member, text): the name of the member and a text stream
+                which can be read line by line, text is None if
+                the member is binary
+        """
+        for member, stream in self.members():
+            if self.sniff(stream):
+                yield member, None
+            else:
+                yield member, io.TextIOWrapper(stream, encoding="utf-8")
@@ -0,0 +1,287 @@
+"""
+Approximate counting of the most frequent patterns with fixed memory.
+HeavyHitterMatcher runs the Aho-Corasick automaton like State, but
+every match (accept event) only updates a Count-Min sketch (estimated
+count of any pattern) and a Space-Saving summary (the K patterns which
+are most likely the most frequent, it follows as many patterns as the
+sketch has counters in a row and the best K are reported). Memory
+depends on the size of the sketch, not on the number of patterns which
+matched.
+"""
+
+from array import array
+from heapq import heappush, heapreplace
+import math
+import sys
+
+from src.ahoc_automaton import State
+
+
+class CountMinSketch:
+
+    def __init__(self, width=4096, depth=4):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [array("Q", bytes(8 * width)) for _ in range(depth)]
+
+    @staticmethod
+    def hashes(item):
+        """
+        two independent halves of the 64 bit hash of the item, the
+        column of row i is (first + i * second) mod width (double
+        hashing: one hash computed for all the rows)
+        """
+        value = hash(item) & 0xffffffffffffffff
+        return value & 0xffffffff, value >> 32 | 1
+
+    def add(self, item, count=1):
+        column, step = self.hashes(item)
+        width = self.width
+        for row in self.rows:
+            row[column % width] += count
+            column += step
+        self.total += count
+
+    def estimate(self, item):
+        """
+        the smallest counter of the item: never less than the true
+        count, more by at most error() with probability confidence()
+        """
+        column, step = self.hashes(item)
+        width = self.width
+        estimate = None
+        for row in self.rows:
+            if estimate is None or row[column % width] < estimate:
+                estimate = row[column % width]
+            column += step
+        return estimate
+
+    def error(self):
+        # e / width of all the counts added
+        return math.e / self.width * self.total
+
+    def confidence(self):
+        return 1 - math.exp(-self.depth)
+
+    def size(self):
+        return self.width * self.depth * 8
+
+
+class SpaceSaving:
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # item -> [count, error]: the true count is between
+        # count - error and count
+        self.counters = {}
+        # (count, item) with the smallest count on top, counts
+        # can be older than the counters (updated when on top)
+        self.heap = []
+
+    def add(self, item, count=1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+            return
+
+        if len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+            heappush(self.heap, (count, item))
+            return
+
+        # refresh the top of the heap until it has the real minimum
+        while True:
+            minimum, smallest = self.heap[0]
+            current = self.counters[smallest][0]
+            if current == minimum:
+                break
+            heapreplace(self.heap, (current, smallest))
+
+        # the new item takes the place of the smallest one,
+        # it may have been counted up to minimum times before
+        del self.counters[smallest]
+        self.counters[item] = [minimum + count, minimum]
+        heapreplace(self.heap, (minimum + count, item))
+
+    def top(self, k=None):
+        """
+        Returns:
+            - list of (item, count, error) of the k items with
+                the largest counts (all the items if k is None)
+        """
+        return sorted(((item, count, error)
+                       for item, (count, error) in self.counters.items()),
+                      key=lambda entry: -entry[1])[:k]
+
+
+class HeavyHitterMatcher:
+
+    # matches are added together for this many charachters before
+    # they update the counters (at most one entry for each charachter)
+    flush_chars = 65536
+    # fail links followed by find_match, only recorded when it is
+    # set to a number, see Stats.watch
+    fail_count = None
+
+    def __init__(self, patterns, k=10, width=4096, depth=4):
+        self.patterns = patterns
+        self.k = k
+        self.width = width
+        self.depth = depth
+        # indices are never collected
+        self.results = {}
+        self.automaton = State.create_automaton(patterns)
+        self.sketch = CountMinSketch(width, depth)
+        self.summary = SpaceSaving(width)
+        self.hits = {}
+        self.chars = 0
+        # matches and largest errors of the texts searched before:
+        # the report covers all the texts of a run
+        self.matches = 0
+        self.worst = (0, 0)
+
+    def reset(self):
+        """
+        This function deletes the counts. Only the patterns are kept
+        - used to search the same patterns in another text
+        """
+        matches, *errors = self.bounds()
+        self.matches += matches
+        self.worst = tuple(map(max, self.worst, errors))
+        self.results = {}
+        self.sketch = CountMinSketch(self.width, self.depth)
+        self.summary = SpaceSaving(self.width)
+        self.hits = {}
+        self.chars = 0
+
+    def clear_results(self):
+        """
+        there are no results, counts are kept - used to stream
+        a long text block by block
+        """
+        self.results = {}
+
+    @property
+    def counts(self):
+        """
+        the top K patterns and their estimated counts, largest first:
+        the smallest upper bound of the sketch and of the summary
+        """
+        self.flush()
+        counts = [(pattern, min(count, self.sketch.estimate(pattern)))
+                  for pattern, count, _ in self.summary.top(self.k)]
+        counts.sort(key=lambda entry: -entry[1])
+        return dict(counts)
+
+    def bounds(self):
+        """
+        Returns:
+            - (matches, sketch error, summary error): number of matches
+                and how much a count can be larger than the true one
+        """
+        self.flush()
+        summary_error = max((error for _, _, error
+                             in self.summary.top(self.k)), default=0)
+        return self.sketch.total, self.sketch.error(), summary_error
+
+    def find_match(self, line, case_insensitive=False):
+        """
+        run the line through the automaton (same transitions as
+        State.find_match) and count each accepted pattern. The matches
+        of many lines are added together before updating the counters:
+        the same patterns match again and again
+
+        Parameters:
+            -line (string): the text to be searched for matches
+            -case_insentitive (bool): standard = False, if true,
+                the matching algorithm ignores case differences
+                in line and search patterns
+        """
+        if case_insensitive:
+            line = line.lower()
+
+        root = self.automaton
+        current_state = root
+        hits = self.hits
+        traversals = 0
+
+        for char in line:
+            # if no new state --> follow fail links
+            while (current_state.find_next_state(char) is None
+                   and current_state.root is False):
+                current_state = current_state.fail
+                traversals += 1
+
+            current_state = current_state.find_next_state(char)
+
+            if current_state is None:
+                current_state = root
+            else:
+                for pattern in current_state.output:
+                    hits[pattern] = hits.get(pattern, 0) + 1
+
+        self.chars += len(line)
+        if self.chars >= self.flush_chars:
+            self.flush()
+        if self.fail_count is not None:
+            self.fail_count += traversals
+
+    def flush(self):
+        """
+        add the matches collected so far to the counters
+        """
+        for pattern, count in self.hits.items():
+            self.sketch.add(pattern, count)
+            self.summary.add(pattern, count)
+        self.hits = {}
+        self.chars = 0
+
+    def statistics(self):
+        """
+        size of the automaton and of the counters
+
+        Returns:
+            - statistics (dict): statistics of the automaton, bytes
+                of the sketch and size of the summary
+        """
+        statistics = self.automaton.statistics()
+        statistics["sketch bytes"] = self.sketch.size()
+        statistics["top k"] = self.k
+        return statistics
+
+    def report(self, stream=sys.stderr):
+        """
+        print the matches of all the texts searched and the error
+        bounds of the counts (the largest of all the texts, each
+        text has its own counts), by default on stderr to keep them
+        apart from the results
+        """
+        matches, *errors = self.bounds()
+        matches += self.matches
+        sketch_error, summary_error = map(max, self.worst, errors)
+
+        print(f"\nApproximate counts (top {self.k}):", file=stream)
+        print(f"\t{'matches':<24}{matches}", file=stream)
+        print(f"\t{'sketch':<24}{self.width} x {self.depth} "
+              f"({self.sketch.size() / 2**10:.1f} KB)", file=stream)
+        print(f"\t{'sketch error':<24}at most "
+              f"{sketch_error:.1f} more than the true count "
+              f"with probability {self.sketch.confidence():.3f}",
+              file=stream)
+        print(f"\t{'top k error':<24}at most {summary_error} more than "
+              f"the true count", file=stream)
+
+
+if __name__ == "__main__":
+    text = "the cat and the hat and the bat sat on the mat"
+    patterns = ["the", "at", "and", "cat", "on", "hat", "bat"]
+
+    s = HeavyHitterMatcher(patterns, k=3, width=64, depth=4)
+    s.find_match(text)
+
+    print(f"Text: {text}")
+    print(f"The 3 most frequent of {patterns}:")
+    for key, count in s.counts.items():
+        print(f"{key:<10}{count}")
+    s.report(sys.stdout)
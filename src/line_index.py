@@ -0,0 +1,49 @@
+from array import array
+from bisect import bisect_right
+
+
+class LineIndex:
+
+    def __init__(self):
+        # index of the first charachter of each line
+        self.starts = array("Q", [0])
+        self.first_line = 1
+        self.__counter = 0
+
+    def add(self, text):
+        """
+        record the beginning of each new line in a piece of text,
+        text has to be added in the same order as it's matched
+
+        Parameters:
+            - text (string): the text which was just matched
+        """
+        position = text.find("\n")
+        while position != -1:
+            self.starts.append(self.__counter + position + 1)
+            position = text.find("\n", position + 1)
+
+        self.__counter += len(text)
+
+    def locate(self, index):
+        """
+        convert an index (as saved by the matchers) in a line
+        and a column with a binary search over the line beginnings
+
+        Parameters:
+            - index (int): the index of a match
+
+        Returns:
+            - (line, column): both starting at 1
+        """
+        i = bisect_right(self.starts, index) - 1
+        return self.first_line + i, index - self.starts[i] + 1
+
+    def discard(self):
+        """
+        forget all lines but the last one, used to keep memory
+        constant while streaming, indices of discarded lines
+        cannot be located anymore
+        """
+        self.first_line += len(self.starts) - 1
+        self.starts = array("Q", [self.starts[-1]])
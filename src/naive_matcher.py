@@ -19,6 +19,14 @@ class NaiveStringMatcher:
         self.__counter = 0
         self.counts = {}
 
+    def clear_results(self):
+        """
+        This function deletes only the results, counts and the
+        counter are kept - used to stream a long text block by block
+        without keeping every index in memory.
+        """
+        self.results = {}
+
     def find_match(self, line, case_insensitive=False):
         """
         slide a window of length of the pattern over the string,
@@ -50,6 +58,18 @@ class NaiveStringMatcher:
                     self.counts[pattern] += 1
         self.__counter += len(line)
 
+    def statistics(self):
+        """
+        size of the matcher
+
+        Returns:
+            - statistics (dict): number of patterns and their total length
+        """
+        return {
+            "patterns": len(self.patterns),
+            "pattern length": sum(len(pattern) for pattern in self.patterns)
+        }
+
     def demo(self, line):
         for pattern in self.patterns:
             for i in range(len(line) - len(pattern) + 1):
@@ -0,0 +1,203 @@
+"""
+Prefetcher reads the next files in a background thread while the
+matcher scans the current one, so that the disk and the CPU work at
+the same time. Files up to one block are read whole, longer text
+files are read block by block and handed to the matcher as a stream.
+Large compressed files and archives are read by the matcher itself.
+At most depth files are read ahead and the blocks waiting to be
+scanned never take more than max_bytes.
+"""
+
+import io
+import os
+import queue
+import threading
+
+from src.file_reader import FileReader
+
+
+class ByteBudget:
+    """
+    memory taken by the blocks which were read and not scanned yet
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        """
+        wait until size bytes are free, a block larger than the whole
+        budget is accepted when nothing else is waiting
+
+        Returns:
+            - False if the prefetcher was stopped while waiting
+        """
+        with self.condition:
+            while (self.used and self.used + size > self.max_bytes
+                   and not self.stopped):
+                self.condition.wait()
+            self.used += size
+            return not self.stopped
+
+    def release(self, size):
+        with self.condition:
+            self.used -= size
+            self.condition.notify_all()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+
+class PrefetchStream(io.RawIOBase):
+    """
+    binary stream over the blocks of a file read by the thread
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.blocks = queue.Queue()
+        self.block = b""
+        self.position = 0
+        self.finished = False
+
+    def readable(self):
+        return True
+
+    def put(self, block):
+        self.blocks.put(block)
+
+    def readinto(self, buffer):
+        while self.position == len(self.block):
+            if self.finished:
+                return 0
+
+            self.budget.release(len(self.block))
+            self.block = self.blocks.get()
+            self.position = 0
+
+            # errors of the thread are raised while reading
+            if isinstance(self.block, Exception):
+                error, self.block = self.block, b""
+                self.finished = True
+                raise error
+            # an empty block is the end of the file
+            if not self.block:
+                self.finished = True
+
+        size = min(len(buffer), len(self.block) - self.position)
+        buffer[:size] = self.block[self.position:self.position + size]
+        self.position += size
+        return size
+
+    def close(self):
+        # give back the blocks which were not read
+        if not self.closed:
+            self.budget.release(len(self.block))
+            self.block = b""
+            while not self.finished:
+                block = self.blocks.get()
+                if isinstance(block, Exception) or not block:
+                    self.finished = True
+                else:
+                    self.budget.release(len(block))
+        super().close()
+
+
+class Prefetcher:
+
+    def __init__(self, filepaths, depth=2, max_bytes=64 * 2**20,
+                 block_size=2**20):
+        self.filepaths = filepaths
+        self.depth = depth
+        self.block_size = block_size
+        self.budget = ByteBudget(max_bytes)
+        # one entry for each file, at most depth files ahead
+        self.files = queue.Queue(maxsize=max(1, depth))
+        self.thread = None
+
+    def read_files(self):
+        """
+        body of the thread: read the files in order and put
+        the data of each file in the queue
+        """
+        for filepath in self.filepaths:
+            if self.budget.stopped:
+                return
+
+            stream = None
+            try:
+                size = os.path.getsize(filepath)
+
+                if size <= self.block_size:
+                    self.budget.acquire(size)
+                    with open(filepath, "rb") as data_file:
+                        data = data_file.read()
+                    # the format is sniffed from the data in memory
+                    file_format = FileReader(
+                        filepath, source=io.BytesIO(data)).file_format
+                    self.files.put((data, size, file_format))
+                    continue
+
+                file_format = FileReader(filepath).file_format
+                if file_format != "text":
+                    self.files.put((None, size, file_format))
+                    continue
+
+                stream = PrefetchStream(self.budget)
+                self.files.put((stream, size, file_format))
+                with open(filepath, "rb") as data_file:
+                    while True:
+                        block = data_file.read(self.block_size)
+                        if not self.budget.acquire(len(block)):
+                            return
+                        stream.put(block)
+                        if not block:
+                            break
+
+            except Exception as error:
+                if stream is None:
+                    self.files.put((error, None, None))
+                else:
+                    stream.put(error)
+
+    def __iter__(self):
+        """
+        generator over the files, in the same order: (data, size,
+        format) where data is bytes (the whole file), a PrefetchStream,
+        None if the file has to be opened by the reader or the exception
+        raised while reading the file. Size and format are found by the
+        thread, so that the matcher does not open the file again.
+        Bytes are given back to the budget when the next file is
+        requested.
+        """
+        self.thread = threading.Thread(target=self.read_files, daemon=True)
+        self.thread.start()
+
+        try:
+            for _ in self.filepaths:
+                data, size, file_format = self.files.get()
+                yield data, size, file_format
+                if isinstance(data, bytes):
+                    self.budget.release(size)
+                elif isinstance(data, PrefetchStream):
+                    data.close()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        stop the thread (also when the matcher stops early)
+        """
+        self.budget.stop()
+        # unblock a thread waiting for space in the queue
+        while self.thread is not None and self.thread.is_alive():
+            try:
+                self.files.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self.thread = None
@@ -0,0 +1,204 @@
+"""
+RabinKarpMatcher is an optional matcher for large dictionaries with
+few distinct pattern lengths. The text is converted in a numpy array
+and the hashes of all windows of each pattern length are computed at
+once, only the windows with the hash of a pattern are compared with
+the patterns. numpy is not required by the rest of the programme:
+without it StringMatcher falls back to the Aho-Corasick automaton.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class RabinKarpMatcher:
+
+    base = 1000003
+    # bits of the hash used by the prefilter table
+    table_bits = 20
+    # numpy has a large cost for each call, lines are matched in blocks
+    block_size = 1048576
+
+    def __init__(self, patterns, lines=True):
+        """
+        Parameters:
+            - patterns (list): the patterns
+            - lines (bool): the text is made of lines joined in blocks,
+                a match cannot go past the end of a line (as when the
+                lines are matched one by one)
+        """
+        self.patterns = patterns
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+        # length -> {pattern: repeats}, same pattern can be given twice
+        self.__lengths = {}
+        for pattern in patterns:
+            # only the last charachter of a match can end a line
+            if lines and "\n" in pattern[:-1]:
+                continue
+            same_length = self.__lengths.setdefault(len(pattern), {})
+            same_length[pattern] = same_length.get(pattern, 0) + 1
+
+        # length -> sorted array of the hashes of the patterns and
+        # a table of the top bits of the hashes (cheap prefilter)
+        self.__hashes = {}
+        self.__tables = {}
+        shift = np.uint64(64 - self.table_bits)
+        for length, same_length in self.__lengths.items():
+            hashes = [self.hash_pattern(pattern) for pattern in same_length]
+            hashes = np.unique(np.array(hashes, dtype=np.uint64))
+            table = np.zeros(2**self.table_bits, dtype=bool)
+            table[hashes >> shift] = True
+            self.__hashes[length] = hashes
+            self.__tables[length] = table
+
+    @staticmethod
+    def available():
+        return np is not None
+
+    def reset(self):
+        """
+        This function delets results, counts and the counter.
+        Only the patterns are kept - used to search the same
+        patterns in another text
+        """
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+
+    def clear_results(self):
+        """
+        This function deletes only the results, counts and the
+        counter are kept - used to stream a long text block by block
+        without keeping every index in memory.
+        """
+        self.results = {}
+
+    @classmethod
+    def hash_pattern(cls, pattern):
+        """
+        polynomial hash of a pattern modulo 2**64, the same
+        function computed by window_hashes for the text
+        """
+        value = 0
+        for char in pattern:
+            value = (value * cls.base + ord(char)) % 2**64
+        return value
+
+    @classmethod
+    def window_hashes(cls, codes, length):
+        """
+        hashes of all the windows of a given length in the text.
+        Hashes of windows of length 1, 2, 4, 8... are computed by
+        doubling, the windows of the requested length are combined
+        from them (binary decomposition of the length): log(length)
+        vector operations instead of one for each charachter.
+        Arithmetic on uint64 arrays wraps around (modulo 2**64).
+
+        Parameters:
+            - codes (array): code points of the text (uint64)
+            - length (int): length of the windows
+
+        Returns:
+            - hashes (array): hash of the window beginning at each index
+        """
+        result = None
+        result_length = 0
+        block = codes
+        block_length = 1
+
+        while length:
+            if length & 1:
+                if result is None:
+                    result = block
+                else:
+                    size = len(codes) - result_length - block_length + 1
+                    power = np.uint64(pow(cls.base, block_length, 2**64))
+                    result = (result[:size] * power
+                              + block[result_length:result_length + size])
+                result_length += block_length
+
+            length >>= 1
+            if length:
+                size = len(block) - block_length
+                power = np.uint64(pow(cls.base, block_length, 2**64))
+                block = (block[:size] * power
+                         + block[block_length:block_length + size])
+                block_length *= 2
+
+        return result
+
+    def find_match(self, line, case_insensitive=False):
+        """
+        for each pattern length compute the hashes of all windows,
+        keep the windows whose hash belongs to a pattern (sorted
+        search) and compare them with the patterns.
+
+        Parameters:
+            -line (string): the text to be searched for matches
+            -case_insentitive (bool): standard = False, if true,
+                the matching algorithm ignores case differences
+                in line and search patterns
+
+        Returns:
+            -void (saves the index where the matches begins in
+                   self__results[pattern], index is of type integer)
+        """
+        if case_insensitive:
+            line = line.lower()
+
+        # one uint32 for each charachter, indices are the same as in line
+        # (lone surrogates, es. from surrogateescape, are kept as well)
+        codes = np.frombuffer(line.encode("utf-32-le", "surrogatepass"),
+                              dtype=np.uint32).astype(np.uint64)
+        shift = np.uint64(64 - self.table_bits)
+
+        for length, same_length in self.__lengths.items():
+            if length > len(line):
+                continue
+
+            hashes = self.window_hashes(codes, length)
+
+            # most windows are discarded by the table, the others
+            # are searched in the sorted hashes of the patterns
+            table = self.__tables[length]
+            candidates = np.flatnonzero(table[hashes >> shift])
+            pattern_hashes = self.__hashes[length]
+            positions = np.searchsorted(pattern_hashes, hashes[candidates])
+            positions[positions == len(pattern_hashes)] = 0
+            candidates = candidates[pattern_hashes[positions]
+                                    == hashes[candidates]]
+
+            for i in candidates.tolist():
+                # verify: different windows can have the same hash
+                pattern = line[i:i + length]
+                if pattern not in same_length:
+                    continue
+
+                if pattern not in self.results:
+                    self.results[pattern] = []
+
+                if pattern not in self.counts:
+                    self.counts[pattern] = 0
+
+                for _ in range(same_length[pattern]):
+                    self.results[pattern].append(i + self.__counter)
+                    self.counts[pattern] += 1
+
+        self.__counter += len(line)
+
+    def statistics(self):
+        """
+        size of the matcher
+
+        Returns:
+            - statistics (dict): number of patterns and
+                of distinct pattern lengths
+        """
+        return {
+            "patterns": len(self.patterns),
+            "pattern lengths": len(self.__lengths)
+        }
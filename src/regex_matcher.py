@@ -0,0 +1,161 @@
+import re
+
+from src.ahoc_automaton import State
+
+
+class RegexMatcher:
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+        # the same pattern can be given more than once
+        self.__repeats = {}
+        for pattern in patterns:
+            self.__repeats[pattern] = self.__repeats.get(pattern, 0) + 1
+        self.__lengths = sorted({len(pattern) for pattern in patterns})
+        self.regex = re.compile(self.build_regex(patterns))
+
+    def reset(self):
+        """
+        This function delets results, counts and the counter.
+        Only the patterns are kept - used to search the same
+        patterns in another text
+        """
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+
+    def clear_results(self):
+        """
+        This function deletes only the results, counts and the
+        counter are kept - used to stream a long text block by block
+        without keeping every index in memory.
+        """
+        self.results = {}
+
+    @classmethod
+    def trie_regex(cls, state):
+        """
+        recursively translate a state of the trie in a regular
+        expression: the children become an alternation (they all begin
+        with a different charachter), a chain of states with only one
+        child becomes a literal and the children of an accepting state
+        are optional (greedy: the longest pattern is tried first)
+
+        Parameters:
+            - state (State): a state of the trie
+
+        Returns:
+            - regex (string): expression for the patterns below state
+        """
+        alternatives = []
+        for char, child in state.children.items():
+            literal = re.escape(char)
+
+            # follow the chain of states without alternatives
+            while len(child.children) == 1 and not child.output:
+                char, child = next(iter(child.children.items()))
+                literal += re.escape(char)
+
+            alternatives.append(literal + cls.trie_regex(child))
+
+        if not alternatives:
+            return ""
+
+        if len(alternatives) == 1 and not state.output:
+            return alternatives[0]
+
+        regex = "(?:" + "|".join(alternatives) + ")"
+        if state.output:
+            regex += "?"
+        return regex
+
+    @classmethod
+    def build_regex(cls, patterns):
+        """
+        merge the patterns in a trie and translate it in one regular
+        expression. The expression is a lookahead, so that it matches
+        the empty string where a pattern begins and overlapping matches
+        are found, the longest pattern is captured in group 1.
+
+        Returns:
+            - regex (string)
+        """
+        trie = State()
+        for pattern in patterns:
+            trie.add_pattern(pattern)
+
+        return "(?=(" + cls.trie_regex(trie) + "))"
+
+    def find_match(self, line, case_insensitive=False):
+        """
+        the regular expression (scanned by the C engine of the re
+        module) finds each index where at least one pattern begins and
+        the longest of them. All the other patterns beginning there
+        are prefixes of the longest one.
+
+        Parameters:
+            -line (string): the text to be searched for matches
+            -case_insentitive (bool): standard = False, if true,
+                the matching algorithm ignores case differences
+                in line and search patterns
+
+        Returns:
+            -void (saves the index where the matches begins in
+                   self__results[pattern], index is of type integer)
+        """
+        if case_insensitive:
+            line = line.lower()
+
+        for match in self.regex.finditer(line):
+            longest = match.group(1)
+            it = match.start() + self.__counter
+
+            for length in self.__lengths:
+                if length > len(longest):
+                    break
+
+                pattern = longest[:length]
+                if pattern not in self.__repeats:
+                    continue
+
+                if pattern not in self.results:
+                    self.results[pattern] = []
+
+                if pattern not in self.counts:
+                    self.counts[pattern] = 0
+
+                for _ in range(self.__repeats[pattern]):
+                    self.results[pattern].append(it)
+                    self.counts[pattern] += 1
+
+        self.__counter += len(line)
+
+    def statistics(self):
+        """
+        size of the matcher
+
+        Returns:
+            - statistics (dict): number of patterns and
+                length of the regular expression
+        """
+        return {
+            "patterns": len(self.patterns),
+            "regex length": len(self.regex.pattern)
+        }
+
+
+if __name__ == "__main__":
+    text = "ushers and his heroes"
+    patterns = ["he", "she", "his", "hers", "her.oes"]
+
+    s = RegexMatcher(patterns)
+    s.find_match(text)
+
+    print(f"Text: {text}")
+    print(f"The patterns {patterns} become the regular expression:")
+    print(s.regex.pattern)
+    for key in s.results:
+        print(f"{key:<10}{s.results[key]}")
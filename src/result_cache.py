@@ -0,0 +1,132 @@
+"""
+ResultCache keeps the results of each file in a SQLite database, so
+that a directory can be searched again without scanning the files
+which did not change. An entry is valid for the same file (path, size
+and modification time) and the same search (fingerprint of patterns
+and options), entries which were not used for a long time are evicted.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+import zlib
+
+
+class ResultCache:
+
+    def __init__(self, path, fingerprint, max_entries=10000):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "path TEXT, fingerprint TEXT, size INTEGER, mtime INTEGER, "
+            "last_used REAL, data BLOB, PRIMARY KEY (path, fingerprint))")
+
+    @staticmethod
+    def create_fingerprint(patterns, options):
+        """
+        fingerprint of a search: two searches with the same
+        fingerprint give the same results on the same file
+
+        Parameters:
+            - patterns (list): the patterns of the search
+            - options (dict): options which change the results
+
+        Returns:
+            - fingerprint (string)
+        """
+        search = json.dumps([patterns, options], sort_keys=True)
+        return hashlib.sha256(search.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def file_key(filepath):
+        status = os.stat(filepath)
+        return os.path.abspath(filepath), status.st_size, status.st_mtime_ns
+
+    def lookup(self, filepath):
+        """
+        look for the results of a file
+
+        Returns:
+            - entries (list): the entries saved by store, None if the
+                file is not in the cache or changed since
+        """
+        path, size, mtime = self.file_key(filepath)
+        row = self.connection.execute(
+            "SELECT size, mtime, data FROM results "
+            "WHERE path = ? AND fingerprint = ?",
+            (path, self.fingerprint)).fetchone()
+
+        if row is None or row[0] != size or row[1] != mtime:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.connection.execute(
+            "UPDATE results SET last_used = ? "
+            "WHERE path = ? AND fingerprint = ?",
+            (time.time(), path, self.fingerprint))
+        return json.loads(zlib.decompress(row[2]).decode("utf-8"))
+
+    def store(self, filepath, entries):
+        """
+        save the results of a file, compressed json
+
+        Parameters:
+            - filepath (Path): the file
+            - entries (list): one dictionary for each member of the
+                file (results, counts, member name, skipped)
+        """
+        path, size, mtime = self.file_key(filepath)
+        data = zlib.compress(json.dumps(entries).encode("utf-8"))
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+            (path, self.fingerprint, size, mtime, time.time(), data))
+        self.stored += 1
+
+    def evict(self):
+        """
+        keep only the max_entries entries used most recently
+        """
+        cursor = self.connection.execute(
+            "DELETE FROM results WHERE rowid NOT IN ("
+            "SELECT rowid FROM results ORDER BY last_used DESC LIMIT ?)",
+            (self.max_entries,))
+        self.evicted += cursor.rowcount
+
+    def close(self):
+        self.evict()
+        self.connection.commit()
+        self.connection.close()
+
+    def report(self, stream=sys.stderr):
+        """
+        print hits, misses and size of the cache, by default on
+        stderr to keep them apart from the results
+        """
+        entries = 0
+        size = 0
+        if os.path.isfile(self.path):
+            connection = sqlite3.connect(self.path)
+            entries = connection.execute(
+                "SELECT COUNT(*) FROM results").fetchone()[0]
+            connection.close()
+            size = os.path.getsize(self.path)
+
+        print(f"\nCache ({self.path}):", file=stream)
+        print(f"\t{'hits':<24}{self.hits}", file=stream)
+        print(f"\t{'misses':<24}{self.misses}", file=stream)
+        print(f"\t{'stored':<24}{self.stored}", file=stream)
+        print(f"\t{'evicted':<24}{self.evicted}", file=stream)
+        print(f"\t{'entries':<24}{entries}", file=stream)
+        print(f"\t{'size':<24}{size / 2**10:.1f} KB", file=stream)
@@ -0,0 +1,165 @@
+"""
+ResultSpill bounds the memory taken by the results of a matcher.
+While a text is scanned, the indices found so far are moved to a
+temporary file (8 bytes for each index) whenever there are more than
+max_indices of them in memory, and the matcher only keeps its counts.
+At output time the indices of each pattern are read back part by part,
+in the same order in which they were found.
+"""
+
+from array import array
+import tempfile
+
+
+class SpilledIndices:
+    """
+    the indices of one pattern: parts in the temporary file,
+    followed by the indices still in memory
+    """
+
+    def __init__(self, spill, parts, remaining):
+        self.spill = spill
+        self.parts = parts
+        self.remaining = remaining
+
+    def __len__(self):
+        return (sum(count for _, count in self.parts)
+                + len(self.remaining))
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def chunks(self, chunk_size=65536):
+        """
+        generator over lists of at most chunk_size indices,
+        only one part of the file is in memory at the time
+        """
+        for position, count in self.parts:
+            indices = self.spill.read(position, count)
+            for start in range(0, len(indices), chunk_size):
+                yield indices[start:start + chunk_size]
+
+        for start in range(0, len(self.remaining), chunk_size):
+            yield self.remaining[start:start + chunk_size]
+
+
+class ResultSpill:
+
+    def __init__(self, max_indices, keep=True):
+        """
+        Parameters:
+            - max_indices (int): indices kept in memory before spilling
+            - keep (bool): if false the indices are dropped instead of
+                being written (only the counts are needed)
+        """
+        self.max_indices = max_indices
+        self.keep = keep
+        # check the size of the results every check_chars charachters
+        self.check_chars = 65536
+        self.chars = 0
+        self.file = None
+        # pattern -> list of (position, number of indices) in the file
+        self.parts = {}
+        # 2 numbers for each index of approximate matches (index, distance)
+        self.width = 1
+
+    def check(self, matcher, line):
+        """
+        called after each line: spill the results of the matcher if
+        they take more than the budget (only checked from time to time,
+        counting the indices of all patterns is not free)
+        """
+        self.chars += len(line)
+        if self.chars < self.check_chars:
+            return
+        self.chars = 0
+
+        if sum(map(len, matcher.results.values())) > self.max_indices:
+            if self.keep:
+                self.write(matcher.results)
+            matcher.clear_results()
+
+    def write(self, results):
+        """
+        append the indices of each pattern to the temporary file,
+        new patterns are added in the order of their first match
+        """
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+
+        for pattern, indices in results.items():
+            if not indices:
+                continue
+
+            data = array("q")
+            if isinstance(indices[0], tuple):
+                self.width = 2
+                for index in indices:
+                    data.extend(index)
+            else:
+                data.extend(indices)
+
+            self.file.seek(0, 2)
+            self.parts.setdefault(pattern, []).append(
+                (self.file.tell(), len(indices)))
+            data.tofile(self.file)
+
+    def read(self, position, count):
+        """
+        read back a part of the file
+
+        Returns:
+            - indices (list): integers or (index, distance) tuples
+        """
+        data = array("q")
+        self.file.seek(position)
+        data.fromfile(self.file, count * self.width)
+
+        if self.width == 2:
+            return list(zip(data[::2], data[1::2]))
+        return data.tolist()
+
+    def collect(self, results):
+        """
+        merge the indices in the file with the results in memory.
+        The temporary file is handed over to the merged results (it is
+        deleted with them) and the spill is empty for the next text.
+
+        Returns:
+            - results (dict): pattern -> SpilledIndices, in the order
+                of the first match of each pattern, the same results
+                if nothing was spilled
+        """
+        if not self.parts:
+            self.chars = 0
+            return results
+
+        # a spill of its own for the indices of this text
+        spilled = ResultSpill(self.max_indices, self.keep)
+        spilled.file, spilled.parts, spilled.width = (self.file, self.parts,
+                                                      self.width)
+        self.file = None
+        self.parts = {}
+        self.width = 1
+        self.chars = 0
+
+        merged = {pattern: SpilledIndices(spilled, parts,
+                                          results.get(pattern, []))
+                  for pattern, parts in spilled.parts.items()}
+        for pattern, indices in results.items():
+            if pattern not in merged:
+                merged[pattern] = indices
+        return merged
+
+    def close(self):
+        """
+        delete the temporary file without collecting the indices,
+        the spill can be used for the next text
+        """
+        if self.file is not None:
+            self.file.close()
+        self.file = None
+        self.parts = {}
+        self.width = 1
+        self.chars = 0
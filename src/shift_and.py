@@ -0,0 +1,129 @@
+class ShiftAndMatcher:
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+        self.__masks = {}
+        self.__initial = 0
+        self.__final = 0
+        self.__ends = {}
+        self.build_masks()
+
+    def reset(self):
+        """
+        This function delets results, counts and the counter.
+        Only the patterns are kept - used to search the same
+        patterns in another text
+        """
+        self.results = {}
+        self.__counter = 0
+        self.counts = {}
+
+    def clear_results(self):
+        """
+        This function deletes only the results, counts and the
+        counter are kept - used to stream a long text block by block
+        without keeping every index in memory.
+        """
+        self.results = {}
+
+    def build_masks(self):
+        """
+        the patterns are concatenated in one long bit vector, one bit
+        for each charachter of each pattern. For each charachter of the
+        alphabet a mask has the bits set where the charachter appears
+        in the patterns. The initial mask has the first bit of each
+        pattern set, the final mask the last one.
+        """
+        position = 0
+        for pattern in self.patterns:
+            self.__initial |= 1 << position
+
+            for char in pattern:
+                self.__masks[char] = self.__masks.get(char, 0) | 1 << position
+                position += 1
+
+            self.__final |= 1 << (position - 1)
+            # bit of the last charachter of the pattern
+            self.__ends[position - 1] = pattern
+
+    def find_match(self, line, case_insensitive=False):
+        """
+        run the bit vector over the string, the state has a bit set for
+        every pattern prefix which ends at the current charachter: shift
+        it by one (start a new prefix for every pattern) and keep only
+        the prefixes which can be continued with the charachter.
+        If a last bit of a pattern is set, the pattern is matched.
+
+        Parameters:
+            -line (string): the text to be searched for matches
+            -case_insentitive (bool): standard = False, if true,
+                the matching algorithm ignores case differences
+                in line and search patterns
+
+        Returns:
+            -void (saves the index where the matches begins in
+                   self__results[pattern], index is of type integer)
+        """
+        if case_insensitive:
+            line = line.lower()
+
+        # local names are faster in the loop
+        mask = self.__masks.get
+        initial = self.__initial
+        final = self.__final
+        state = 0
+
+        for i, char in enumerate(line):
+            state = ((state << 1) | initial) & mask(char, 0)
+            if not state & final:
+                continue
+
+            # one iteration for each pattern ending here
+            matched = state & final
+            while matched:
+                lowest = matched & -matched
+                pattern = self.__ends[lowest.bit_length() - 1]
+
+                if pattern not in self.results:
+                    self.results[pattern] = []
+
+                if pattern not in self.counts:
+                    self.counts[pattern] = 0
+
+                # add counter to i (for multiline input)
+                it = i + self.__counter
+                self.results[pattern].append(it - len(pattern) + 1)
+                self.counts[pattern] += 1
+                matched ^= lowest
+
+        self.__counter += len(line)
+
+    def statistics(self):
+        """
+        size of the matcher
+
+        Returns:
+            - statistics (dict): number of patterns, length of the
+                bit vector and size of the alphabet
+        """
+        return {
+            "patterns": len(self.patterns),
+            "mask bits": self.__final.bit_length(),
+            "alphabet": len(self.__masks)
+        }
+
+
+if __name__ == "__main__":
+    text = "I am Curiouser and Curiouser!"
+    patterns = ["Curious", "user", "ser"]
+
+    s = ShiftAndMatcher(patterns)
+    s.find_match(text)
+
+    print(f"Text: {text}")
+    print(f"We want to find the indeces of these patterns: {patterns}")
+    for key in s.results:
+        print(f"{key:<10}{s.results[key]}")
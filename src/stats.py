@@ -0,0 +1,187 @@
+"""
+Stats collects the performance figures of a run: time spent in each
+phase of the programme, throughput of the matching, size of the matcher
+and peak memory. Phases are always timed (a couple of calls for each
+file), figures which would slow down the matching (time spent reading
+each line, fail links followed for each charachter) are only recorded
+when the statistics are requested. Fail links are counted by the
+matcher during the scan itself.
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+class Stats:
+
+    # order in which the phases are printed
+    phases = [
+        "pattern load",
+        "automaton build",
+        "file discovery",
+        "index",
+        "read",
+        "scan",
+        "output",
+        "json dump"
+    ]
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = {}
+        self.bytes = 0
+        self.chars = 0
+        self.files = 0
+        self.fail_traversals = None
+        self.matcher = {}
+
+    def add(self, phase, seconds):
+        if phase not in self.timings:
+            self.timings[phase] = 0
+        self.timings[phase] += seconds
+
+    @contextmanager
+    def phase(self, phase):
+        """
+        context manager to time a phase of the programme,
+        the time is added to the previous runs of the same phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def timed_lines(self, text):
+        """
+        generator over the lines of a text which records the time
+        spent reading them and the number of charachters read
+
+        Parameters:
+            - text (iterable): a text stream or a list of lines
+        """
+        iterator = iter(text)
+        while True:
+            start = time.perf_counter()
+            try:
+                line = next(iterator)
+            except StopIteration:
+                self.add("read", time.perf_counter() - start)
+                return
+            self.add("read", time.perf_counter() - start)
+            self.chars += len(line)
+            yield line
+
+    def watch(self, matcher):
+        """
+        ask the matcher to count the fail links it follows while it
+        matches, only possible for matchers with fail links
+        """
+        if not hasattr(matcher, "fail_count"):
+            return
+
+        matcher.fail_count = 0
+        if self.fail_traversals is None:
+            self.fail_traversals = 0
+
+    def count_fail_traversals(self, matcher):
+        """
+        add the fail links followed by a watched matcher
+        since the last call
+        """
+        if getattr(matcher, "fail_count", None):
+            self.fail_traversals += matcher.fail_count
+            matcher.fail_count = 0
+
+    @staticmethod
+    def peak_rss():
+        """
+        peak resident memory of the process in bytes, None if unknown
+        """
+        if resource is None:
+            return None
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # linux reports kilobytes, macOS bytes
+        if sys.platform != "darwin":
+            peak *= 1024
+        return peak
+
+    def summary(self):
+        """
+        collect all figures in a dictionary
+
+        Returns:
+            - summary (dict): timings (seconds), throughput,
+                matcher size and peak memory
+        """
+        timings = {phase: self.timings[phase]
+                   for phase in self.phases if phase in self.timings}
+
+        summary = {
+            "timings": timings,
+            "files": self.files,
+            "bytes": self.bytes,
+            "chars": self.chars,
+            "matcher": self.matcher,
+            "peak_rss": self.peak_rss()
+        }
+
+        scan = self.timings.get("scan", 0)
+        if scan:
+            summary["bytes_per_second"] = self.bytes / scan
+            summary["chars_per_second"] = self.chars / scan
+
+        if self.fail_traversals is not None and self.chars:
+            summary["fail_traversals"] = self.fail_traversals
+            summary["fail_traversals_per_char"] = (self.fail_traversals
+                                                   / self.chars)
+
+        return summary
+
+    def report(self, style="text", stream=sys.stderr):
+        """
+        print the statistics of the run in human readable form
+        or as json, by default on stderr to keep them apart
+        from the results
+        """
+        summary = self.summary()
+
+        if style == "json":
+            print(json.dumps(summary, indent=4), file=stream)
+            return
+
+        print("\nStatistics:", file=stream)
+        for phase, seconds in summary["timings"].items():
+            print(f"\t{phase:<24}{seconds:.4f} s", file=stream)
+
+        print(f"\t{'files':<24}{summary['files']}", file=stream)
+        print(f"\t{'bytes':<24}{summary['bytes']}", file=stream)
+        print(f"\t{'chars':<24}{summary['chars']}", file=stream)
+
+        if "bytes_per_second" in summary:
+            print(f"\t{'throughput':<24}"
+                  f"{summary['bytes_per_second'] / 2**20:.2f} MB/s, "
+                  f"{summary['chars_per_second'] / 2**20:.2f} Mchars/s",
+                  file=stream)
+
+        for key, value in summary["matcher"].items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            print(f"\t{key:<24}{value}", file=stream)
+
+        if "fail_traversals" in summary:
+            print(f"\t{'fail links per char':<24}"
+                  f"{summary['fail_traversals_per_char']:.4f}", file=stream)
+
+        if summary["peak_rss"] is not None:
+            print(f"\t{'peak memory':<24}"
+                  f"{summary['peak_rss'] / 2**20:.1f} MB", file=stream)
@@ -6,21 +6,85 @@ the correct matching algorithm and formats the output in
 a readable way
 """
 
+from bisect import bisect_left
+import io
 import json
 from pathlib import Path
 import sys
 import os
+import time
 
 from src.naive_matcher import NaiveStringMatcher
 from src.ahoc_automaton import State
+from src.shift_and import ShiftAndMatcher
+from src.regex_matcher import RegexMatcher
+from src.rabin_karp import RabinKarpMatcher
+from src.approximate_matcher import ApproximateMatcher
+from src.file_reader import FileReader
+from src.line_index import LineIndex
+from src.stats import Stats
+from src.result_cache import ResultCache
+from src.trigram_index import TrigramIndex
+from src.suffix_array import SuffixArray
+from src.prefetcher import Prefetcher
+from src.compiled_automaton import CompiledAutomaton
+from src.result_spill import ResultSpill
+from src.heavy_hitters import HeavyHitterMatcher
 
 
 class StringMatcher():
 
-    def __init__(self, pattern, text, naive, case, recursive, json, counter):
-        self.patterns = self.extract_pattern(pattern)
+    # approximate memory of one index in a list (pointer and int)
+    index_size = 36
+
+    def __init__(self, pattern, text, naive, case, recursive, json, counter,
+                 lines=False, context=False, stats=None, engine="ahc",
+                 max_errors=None, cache=None, rescan=False,
+                 cache_stats=False, cache_size=10000, index=None,
+                 suffix_array=None, prefetch=0, prefetch_memory=64,
+                 automaton=None, result_memory=None, top=None,
+                 sketch_width=4096, sketch_depth=4):
+        # stats is None or the style of the report (text or json)
+        self.stats_style = stats
+        self.stats = Stats(enabled=stats is not None)
+
+        with self.stats.phase("pattern load"):
+            self.patterns = self.extract_pattern(pattern)
         self.text = text
         self.naive = naive
+        self.engine = engine
+        self.max_errors = max_errors
+        # path of the result cache (only used for files)
+        self.cache_path = cache
+        self.cache = None
+        self.rescan = rescan
+        self.cache_stats = cache_stats
+        self.cache_size = cache_size
+        # path of the trigram index (only used for files)
+        self.index_path = index
+        # path of the suffix array of a single file
+        self.suffix_array_path = suffix_array
+        # files read ahead by a thread and memory (MB) for their blocks
+        self.prefetch = prefetch
+        self.prefetch_memory = prefetch_memory
+        # bytes of the chunks read from a file, size of the blocks read
+        # ahead (bytes) or from stdin (charachters)
+        self.chunk_size = 65536
+        self.block_size = 1048576
+        # file of the compiled automaton, mapped in memory
+        self.automaton_path = automaton
+        # approximate counts of the top patterns, size of the sketch
+        self.top = top
+        self.sketch_width = sketch_width
+        self.sketch_depth = sketch_depth
+        self.heavy_hitters = None
+        # the compiled automaton is closed at the end of the run
+        self.compiled_automaton = None
+        # memory budget (MB) of the results of a file
+        self.spill = None
+        if result_memory is not None:
+            self.spill = ResultSpill(result_memory * 2**20
+                                     // self.index_size, keep=not counter)
         self.case_insensitive = case
         self.__results = {}
         self.recursive = recursive
@@ -28,9 +92,18 @@ class StringMatcher():
         self.input = []
         self.counter = counter
         self.errors = []
+        self.skipped = []
         self.first_print = True
-        self.text_type = self.define_text_type()
+        # results are written here, other messages are printed
+        self.out = sys.stdout
+        with self.stats.phase("file discovery"):
+            self.text_type = self.define_text_type()
         self.json_results = {}
+        # context is only shown next to line and column
+        self.lines = lines or context
+        self.context = context
+        self.line_index = None
+        self.context_lines = {}
         self.validate_data()
 
     def extract_pattern(self, patterns):
@@ -82,6 +155,9 @@ class StringMatcher():
             the input is already in string file
             it saves it in a list of strings
 
+        - stdin:
+            the input is "-", the text is read from the standard input
+
         it returns a string (file or string) for better
         readability (instead of checking during unpacking if data type
         is a tuple or a string)
@@ -90,6 +166,11 @@ class StringMatcher():
         if len(self.text) == 1:
             text = self.text[0]
 
+            # STANDARD INPUT
+            if text == "-":
+                self.input.append("<stdin>")
+                return "stdin"
+
             # DIRECTORY
             if os.path.isdir(text):
                 # retrieve files
@@ -160,13 +241,56 @@ class StringMatcher():
             if self.case_insensitive:
                 self.patterns[i] = self.patterns[i].lower()
 
-        # naive matcher option
-        if self.naive:
-            matcher = NaiveStringMatcher(self.patterns)
-            return matcher
+        # numpy is optional: fall back to the automaton
+        if self.engine == "numpy" and not RabinKarpMatcher.available():
+            print("WARNING! numpy is not installed, "
+                  "the Aho-Corasick automaton is used instead")
+            self.engine = "ahc"
+
+        with self.stats.phase("automaton build"):
+            # approximate matching, its own filter and verification
+            if self.max_errors is not None:
+                matcher = ApproximateMatcher(self.patterns, self.max_errors)
+
+            # approximate counts of the most frequent patterns
+            elif self.top is not None:
+                matcher = HeavyHitterMatcher(self.patterns, self.top,
+                                             self.sketch_width,
+                                             self.sketch_depth)
+                self.heavy_hitters = matcher
+
+            # naive matcher option
+            elif self.naive or self.engine == "naive":
+                matcher = NaiveStringMatcher(self.patterns)
+
+            # bit parallel matcher for few short patterns
+            elif self.engine == "shift-and":
+                matcher = ShiftAndMatcher(self.patterns)
+
+            # trie shaped regular expression scanned by the re module
+            elif self.engine == "regex":
+                matcher = RegexMatcher(self.patterns)
+
+            # vectorized hashes of the windows for large dictionaries
+            elif self.engine == "numpy":
+                # strings are matched whole, files and stdin by lines
+                matcher = RabinKarpMatcher(
+                    self.patterns, lines=self.text_type != "string")
+
+            # automaton compiled in a file shared by all processes
+            elif self.automaton_path is not None:
+                matcher = CompiledAutomaton.load(self.automaton_path,
+                                                 self.patterns)
+                self.compiled_automaton = matcher
+
+            # AHC matcher by default
+            else:
+                matcher = State.create_automaton(self.patterns)
+
+        if self.stats.enabled:
+            self.stats.matcher = matcher.statistics()
+            self.stats.watch(matcher)
 
-        # AHC matcher by default
-        matcher = State.create_automaton(self.patterns)
         return matcher
 
     @staticmethod
@@ -210,20 +334,31 @@ class StringMatcher():
     @property
     def results(self):
         """
-        this functions prepares the output of the programme for a
-        single run (either a string or one file)
-        based on various parameters (number of patterns, counter,
-        number of TEXT parameters) the results will look slightly
-        different
-
-        Parameters:
-            - results from matcher (saved in self.results)
+        the output of the programme for a single run as a string,
+        see write_results (used if the output is not printed)
 
         Returns:
             - to_print (string):
         """
-        to_print = ""
+        to_print = io.StringIO()
+        self.write_results(to_print)
+
+        # remove last newline
+        return to_print.getvalue()[:-1]
 
+    def write_results(self, stream):
+        """
+        this functions writes the output of the programme for a
+        single run (either a string or one file) to a stream
+        based on various parameters (number of patterns, counter,
+        number of TEXT parameters) the results will look slightly
+        different. Indices are formatted and written in chunks,
+        the whole output is never built in memory.
+
+        Parameters:
+            - stream (file): where the results are written
+            - results from matcher (saved in self.__results)
+        """
         # determine longest key for pretty print
         limit = 0
         for key in self.__results:
@@ -236,28 +371,141 @@ class StringMatcher():
             spacing = "\t"
 
         for key in self.__results:
-            key_name = key
-            if len(self.patterns) < 2:
-                key_name = ""
+            prefix = spacing
+            if len(self.patterns) > 1:
+                prefix = f"{spacing}{key:<{limit+2}}"
 
             if self.counter:
-                matches = self.__results[key]
+                stream.write(f"{prefix}{self.__results[key]}\n")
+
+            elif self.lines:
+                for matches in self.format_positions(key):
+                    stream.write(f"{prefix}{matches}\n")
+
             else:
-                matches = ", ".join([str(i) for i in self.__results[key]])
+                stream.write(prefix)
+                self.write_indices(stream, self.__results[key])
+                stream.write("\n")
 
-            if len(self.patterns) > 1:
-                to_print += (f'{spacing}{key_name:<{limit+2}}{matches}\n')
+    def write_indices(self, stream, indices, chunk_size=65536):
+        """
+        write a list of indices separated by commas, formatting
+        chunk_size indices at the time
+
+        Parameters:
+            - stream (file): where the indices are written
+            - indices (list): integers or, for approximate matching,
+                (index, distance) tuples. Indices moved to disk
+                (SpilledIndices) are read back in chunks
+        """
+        if self.max_errors is not None:
+            # index and edit distance of each match
+            def format_index(match):
+                return f"{match[0]} ({match[1]})"
+        else:
+            format_index = str
+
+        if hasattr(indices, "chunks"):
+            chunks = indices.chunks(chunk_size)
+        else:
+            chunks = (indices[start:start + chunk_size]
+                      for start in range(0, len(indices), chunk_size))
+
+        for i, chunk in enumerate(chunks):
+            if i:
+                stream.write(", ")
+            stream.write(", ".join(map(format_index, chunk)))
+
+    def positions(self, key):
+        """
+        convert the indices of a pattern in (line, column) pairs,
+        with context the matching line is added as third element
+
+        Parameters:
+            - key (string): a pattern in self.__results
+
+        Returns:
+            - positions (list of tuples)
+        """
+        positions = []
+        for index in self.__results[key]:
+            line, column = self.line_index.locate(index)
+            if self.context:
+                positions.append((line, column,
+                                  self.context_lines.get(line, "")))
             else:
-                to_print += (f'{spacing}{matches}\n')
+                positions.append((line, column))
 
-        # remove last newline
-        to_print = to_print[:-1]
+        return positions
+
+    def format_positions(self, key):
+        """
+        format the positions of a pattern for the console:
+        all positions in one row or, with context, one row per match
+
+        Returns:
+            - rows (list of strings)
+        """
+        positions = self.positions(key)
+
+        if self.context:
+            return [f"{line}:{column}  {text}"
+                    for line, column, text in positions]
+
+        return [", ".join([f"{line}:{column}"
+                           for line, column in positions])]
+
+    def collect_context(self, lines, first_line=1, start=0):
+        """
+        save in self.context_lines the lines which contain a match.
+        Only called with context: lines are looked up after matching,
+        so that the plain search does not keep any line in memory
+
+        Parameters:
+            - lines (iterable): the lines of the text, without newline
+            - first_line (int): the number of the first line in lines
+            - start (int): only matches from this index are considered
+        """
+        needed = set()
+        for indices in self.__results.values():
+            for index in indices[bisect_left(indices, start):]:
+                needed.add(self.line_index.locate(index)[0])
+
+        if not needed:
+            return
+
+        last = max(needed)
+        for number, line in enumerate(lines, first_line):
+            if number in needed:
+                self.context_lines[number] = line.rstrip("\r\n")
+            if number >= last:
+                break
+
+    @staticmethod
+    def member_lines(filepath, member):
+        """
+        open again a file (or a member of an archive) to read
+        its lines, used to collect the context of the matches
+        """
+        for name, text in FileReader(filepath).text_members():
+            if name == member:
+                yield from text
+                return
+
+    def json_view(self):
+        """
+        the results of one text as they are saved in the json file
+        """
+        if self.counter or not self.lines:
+            return self.__results
 
-        return to_print
+        return {key: self.positions(key) for key in self.__results}
 
     def save_json(self):
-        with open("results.json", "w", encoding="utf-8") as json_f:
-            json.dump(self.json_results, json_f, ensure_ascii=False, indent=4)
+        with self.stats.phase("json dump"):
+            with open("results.json", "w", encoding="utf-8") as json_f:
+                json.dump(self.json_results, json_f, ensure_ascii=False,
+                          indent=4)
 
     def output(self, argument):
         """
@@ -273,45 +521,53 @@ class StringMatcher():
         Returns:
             None, prints the results to the console or saves them json_results
         """
-        if not self.json:
-            if not self.first_print:
-                print()
-
-        self.first_print = False
+        with self.stats.phase("output"):
+            if not self.json:
+                if not self.first_print:
+                    self.out.write("\n")
 
-        if isinstance(argument, tuple):
-            filepath, filename = argument
+            self.first_print = False
 
-            if not self.json:
-                # if -r, print the path AND the name of the file
-                # if not only filename, path is given by user
-                if filename:
-                    to_print = filename
-                    if self.recursive:
-                        to_print = filepath
-                    print(f"- {to_print}")
+            if isinstance(argument, tuple):
+                filepath, filename = argument
 
-                print(self.results)
+                if not self.json:
+                    # if -r, print the path AND the name of the file
+                    # if not only filename, path is given by user
+                    if filename:
+                        to_print = filename
+                        if self.recursive:
+                            to_print = filepath
+                        self.out.write(f"- {to_print}\n")
 
-            else:
-                # always use complete path as key, otherwise path lost
-                # once the file is saved
-                self.json_results[str(filepath)] = self.__results
+                    self.write_results(self.out)
 
-        # string
-        else:
-            if not self.json:
-                # if multiple TEXTS, print TEXT
-                if len(self.input) > 1:
-                    print(f"- {argument}")
-                print(self.results)
+                else:
+                    # always use complete path as key, otherwise path lost
+                    # once the file is saved
+                    self.json_results[str(filepath)] = self.json_view()
 
+            # string
             else:
-                self.json_results[argument] = self.__results
+                if not self.json:
+                    # if multiple TEXTS, print TEXT
+                    if len(self.input) > 1:
+                        self.out.write(f"- {argument}\n")
+                    self.write_results(self.out)
+
+                else:
+                    self.json_results[argument] = self.json_view()
 
     def process_files(self):
         """
         This function processes the input which comes in form of a file.
+        Compressed files and archives are decompressed while reading,
+        each member of an archive is matched and printed on its own
+        (offsets are relative to the decompressed member).
+        With a cache, files which did not change since the last search
+        are not opened, their results are read from the cache.
+        With prefetch, the next files to be searched are read by a
+        thread while the current one is matched.
 
         Parameters:
             self.input (list of tuples (path, filename))
@@ -320,36 +576,383 @@ class StringMatcher():
             saves the results from the matcher in self.__results
         """
         matcher = self.choose_algorithm()
-        # process one file at the time for better memory management
-        for i, element in enumerate(self.input):
-            filepath, _ = element
 
+        if self.cache_path is not None:
+            # options which change the results of a file
+            options = {
+                "case_insensitive": self.case_insensitive,
+                "max_errors": self.max_errors
+            }
+            fingerprint = ResultCache.create_fingerprint(self.patterns,
+                                                         options)
+            self.cache = ResultCache(self.cache_path, fingerprint,
+                                     self.cache_size)
+
+        candidates = None
+        if self.index_path is not None:
+            candidates = self.index_candidates()
+
+        # decide first which files have to be read, so that
+        # only them are read ahead
+        known = []
+        for filepath, _ in self.input:
+            entries = None
             try:
-                with open(filepath, "r", encoding="utf-8") as readfile:
-                    for line in readfile:
-                        matcher.find_match(line, self.case_insensitive)
+                if candidates is not None and filepath not in candidates:
+                    # the file does not contain the trigrams of any pattern
+                    entries = []
 
-            # collect unreadeable files for error log
+                elif self.cache is not None and not self.rescan:
+                    entries = self.cache.lookup(filepath)
+
+            # the error is collected when the file is searched
             except Exception:
-                self.errors.append(str(filepath))
+                pass
+            known.append(entries)
 
-            # copy results and reset matcher for next file
-            self.__results = matcher.results
+        sources = self.file_sources([element[0] for element, entries
+                                     in zip(self.input, known)
+                                     if entries is None])
 
-            if self.counter:
-                self.__results = matcher.counts
+        # process one file at the time for better memory management
+        for i, (element, entries) in enumerate(zip(self.input, known)):
+            filepath, _ = element
 
-            matcher.reset()
+            try:
+                if entries is not None:
+                    self.replay_file(element, entries)
+
+                else:
+                    source, size, file_format = next(sources)
+                    entries = self.search_file(matcher, element, source,
+                                               size, file_format)
+                    if self.cache is not None:
+                        self.cache.store(filepath, entries)
 
-            # output - print or json
-            if self.results:
-                self.output(element)
+            # collect unreadeable files for error log
+            except Exception:
+                self.errors.append(str(filepath))
+                self.collect_results(matcher, element)
 
             # if json print progress bar
             if self.json:
                 self.progress_bar(i+1, len(self.input), prefix="Matching:",
                                   fixed_len=True, length=40)
 
+        if self.cache is not None:
+            self.cache.close()
+
+    def file_sources(self, filepaths):
+        """
+        generator over the content of the files to be searched: without
+        prefetch the files are opened by FileReader, otherwise they are
+        read ahead by a thread which also finds their size and format
+
+        Returns:
+            - (source, size, format): binary stream (None if not read
+                ahead or the error of the thread), size and format
+                (None if unknown)
+        """
+        if not self.prefetch:
+            for _ in filepaths:
+                yield None, None, None
+            return
+
+        prefetcher = Prefetcher(filepaths, self.prefetch,
+                                self.prefetch_memory * 2**20,
+                                self.block_size)
+        for data, size, file_format in prefetcher:
+            if isinstance(data, bytes):
+                data = io.BytesIO(data)
+            yield data, size, file_format
+
+    def index_candidates(self):
+        """
+        update the trigram index for the files of the input (only new
+        and modified files are read) and ask it which files can
+        contain the patterns
+
+        Returns:
+            - candidates (set): paths of the files to be searched
+        """
+        with self.stats.phase("index"):
+            index = TrigramIndex.load(self.index_path)
+            filepaths = [filepath for filepath, _ in self.input]
+            index.update(filepaths)
+            index.save()
+            # trigrams are lowercase, the same index works with -i
+            return index.candidates(filepaths, self.patterns)
+
+    def process_suffix_array(self):
+        """
+        answer the patterns with a suffix array of a single file instead
+        of scanning it: the array is built on the first run and saved,
+        the next runs (with any patterns) only load it and search it.
+        The file must have only one text member.
+        """
+        if self.case_insensitive:
+            self.patterns = [pattern.lower() for pattern in self.patterns]
+
+        element = self.input[0]
+        filepath, _ = element
+
+        try:
+            with self.stats.phase("read"):
+                members = []
+                # members are closed when the next one is read
+                for member, stream in FileReader(filepath).text_members():
+                    text = stream.read() if stream is not None else None
+                    members.append((member, text))
+                if len(members) != 1:
+                    raise ValueError("one text member is required")
+
+                member, text = members[0]
+                member_element = self.member_element(element, member)
+                if text is None:
+                    self.skipped.append(str(member_element[0]))
+                    return
+
+                if self.case_insensitive:
+                    text = text.lower()
+
+            self.stats.files += 1
+            self.stats.bytes += os.path.getsize(filepath)
+            self.stats.chars += len(text)
+
+            with self.stats.phase("index"):
+                index = None
+                if os.path.isfile(self.suffix_array_path):
+                    index = SuffixArray.load(self.suffix_array_path, text)
+                if index is None:
+                    index = SuffixArray(text)
+                    index.save(self.suffix_array_path)
+
+            with self.stats.phase("scan"):
+                results, counts = index.search(self.patterns, self.counter)
+
+            if self.stats.enabled:
+                self.stats.matcher = index.statistics()
+
+        # collect unreadeable files for error log
+        except Exception:
+            self.errors.append(str(filepath))
+            return
+
+        self.output_results(member_element, results, counts)
+
+    @staticmethod
+    def member_element(element, member):
+        """
+        archive members are shown as a path inside the archive
+
+        Returns:
+            - element (tuple): (path, filename) of the member
+        """
+        if member is None:
+            return element
+
+        filepath, filename = element
+        member_name = member
+        if filename:
+            member_name = f"{filename}/{member}"
+        return (filepath / member, member_name)
+
+    def search_file(self, matcher, element, source=None, size=None,
+                    file_format=None):
+        """
+        search every member of a file and output the results
+
+        Parameters:
+            - matcher (object): the matcher
+            - element (tuple): (path, filename) of the file
+            - source (binary stream): the content of the file if it
+                was already read, see file_sources
+            - size, file_format: size and format of the file if they
+                are already known, the file is not opened to find them
+
+        Returns:
+            - entries (list): results and counts of each member, only
+                collected if they are saved in the cache
+        """
+        filepath, _ = element
+        entries = []
+
+        # the file could not be read by the prefetcher
+        if isinstance(source, Exception):
+            raise source
+
+        reader = FileReader(filepath, self.chunk_size, source=source,
+                            file_format=file_format)
+        if size is None:
+            size = os.path.getsize(filepath)
+        self.stats.files += 1
+        self.stats.bytes += size
+
+        for member, text in reader.text_members():
+            member_element = self.member_element(element, member)
+
+            # skip binary files before matching them
+            if text is None:
+                self.skipped.append(str(member_element[0]))
+                entries.append({"member": member, "skipped": True})
+                continue
+
+            self.scan_text(matcher, text)
+
+            results, counts = self.collect_results(
+                matcher, member_element, self.member_lines(filepath, member))
+
+            if self.cache is not None:
+                entries.append({"member": member, "results": results,
+                                "counts": counts})
+
+        return entries
+
+    def replay_file(self, element, entries):
+        """
+        output the results of a file saved in the cache
+
+        Parameters:
+            - element (tuple): (path, filename) of the file
+            - entries (list): entries returned by search_file
+        """
+        for entry in entries:
+            member_element = self.member_element(element, entry["member"])
+
+            if entry.get("skipped"):
+                self.skipped.append(str(member_element[0]))
+                continue
+
+            self.output_results(member_element, entry["results"],
+                                entry["counts"])
+
+    def scan_text(self, matcher, text):
+        """
+        run the matcher over a text line by line. The plain loop is
+        used unless line positions or statistics have to be recorded
+
+        Parameters:
+            - matcher (object): the matcher
+            - text (iterable): a text stream or a list of strings
+        """
+        if self.lines:
+            self.line_index = LineIndex()
+
+        # matchers with a large cost for each call get blocks of lines
+        if hasattr(matcher, "block_size"):
+            text = self.blocks(text, matcher.block_size)
+
+        if (not self.lines and not self.stats.enabled
+                and self.spill is None):
+            with self.stats.phase("scan"):
+                for line in text:
+                    matcher.find_match(line, self.case_insensitive)
+            return
+
+        if self.stats.enabled:
+            text = self.stats.timed_lines(text)
+        # reading is not part of the scan
+        excluded = self.stats.timings.get("read", 0)
+        start = time.perf_counter()
+
+        for line in text:
+            # record where each line begins while matching
+            if self.lines:
+                self.line_index.add(line)
+            matcher.find_match(line, self.case_insensitive)
+            # move the results to disk if they take too much memory
+            if self.spill is not None:
+                self.spill.check(matcher, line)
+
+        excluded = self.stats.timings.get("read", 0) - excluded
+        self.stats.add("scan", time.perf_counter() - start - excluded)
+        self.stats.count_fail_traversals(matcher)
+
+    @staticmethod
+    def blocks(text, block_size):
+        """
+        generator which joins the lines of a text in blocks
+        of at least block_size charachters (or the last lines)
+        """
+        block = []
+        size = 0
+        for line in text:
+            block.append(line)
+            size += len(line)
+            if size >= block_size:
+                yield "".join(block)
+                block = []
+                size = 0
+
+        if block:
+            yield "".join(block)
+
+    @staticmethod
+    def stream_blocks(stream, block_size):
+        """
+        generator over blocks of about block_size charachters of a text
+        stream, each block is completed up to the end of its last line.
+        Lines longer than block_size are cut, so that a block is never
+        longer than 2 * block_size charachters
+        """
+        while True:
+            block = stream.read(block_size)
+            if not block:
+                return
+            if not block.endswith("\n"):
+                block += stream.readline(block_size)
+            yield block
+
+    def collect_results(self, matcher, element, lines=None):
+        """
+        copy the results of a single file (or archive member),
+        reset the matcher for the next one and output the results
+
+        Parameters:
+            - matcher (object): the matcher which searched the file
+            - element (tuple): (path, filename) of the file
+            - lines (iterable): the lines of the file, only read
+                if the context of the matches is needed
+
+        Returns:
+            - results, counts (dict): the results (with the indices
+                spilled to disk) and the counts of the file
+        """
+        results = matcher.results
+        counts = matcher.counts
+        matcher.reset()
+
+        # indices moved to disk are merged back, they are read from
+        # the temporary file while writing them
+        if self.spill is not None:
+            results = self.spill.collect(results)
+
+        self.output_results(element, results, counts, lines)
+        return results, counts
+
+    def output_results(self, element, results, counts, lines=None):
+        """
+        output the results (or the counts) of a single file
+
+        Parameters:
+            - element (tuple): (path, filename) of the file
+            - results, counts (dict): results and counts of the matcher
+            - lines (iterable): the lines of the file, only read
+                if the context of the matches is needed
+        """
+        self.__results = results
+
+        if self.counter:
+            self.__results = counts
+
+        elif self.context and lines is not None:
+            self.context_lines = {}
+            self.collect_context(lines)
+
+        # output - print or json (no results, no patterns)
+        if self.__results:
+            self.output(element)
+
     def process_strings(self):
         """
         This function processes the input which comes in form of a string.
@@ -360,16 +963,111 @@ class StringMatcher():
         Returns:
             saves the results from the matcher in self.__results
         """
+        # one matcher for all the strings, reset after each of them
+        matcher = self.choose_algorithm()
+
         for string in self.input:
-            matcher = self.choose_algorithm()
-            matcher.find_match(string, self.case_insensitive)
+            if self.stats.enabled:
+                self.stats.bytes += len(string.encode("utf-8"))
+            self.scan_text(matcher, [string])
             self.__results = matcher.results
+            if self.spill is not None:
+                self.__results = self.spill.collect(self.__results)
 
             if self.counter:
                 self.__results = matcher.counts
 
+            elif self.lines:
+                if self.context:
+                    self.context_lines = {}
+                    self.collect_context(string.split("\n"))
+
             if self.__results:
                 self.output(string)
+            matcher.reset()
+
+    def process_stdin(self, block_size=1048576):
+        """
+        This function processes the standard input as a stream.
+        The input is read in blocks of about block_size characters,
+        each block is completed up to the end of its last line so that
+        no match is cut in half, and its lines are matched one by one
+        as the lines of a file. Indices are carried across blocks and
+        the results are printed (or only counted) after each block,
+        memory does not grow with the length of the stream (unless
+        saved in json).
+
+        Parameters:
+            - block_size (int): number of characters read at once
+
+        Returns:
+            prints the results of each block or saves them
+            in self.__results at the end of the stream
+        """
+        matcher = self.choose_algorithm()
+        self.line_index = LineIndex()
+        blocks = self.stream_blocks(sys.stdin, block_size)
+        start = 0
+
+        while True:
+            with self.stats.phase("read"):
+                block = next(blocks, "")
+                if not block:
+                    break
+
+            if self.stats.enabled:
+                self.stats.bytes += len(block.encode("utf-8"))
+                self.stats.chars += len(block)
+
+            # lines are matched one by one, as the lines of a file
+            lines = io.StringIO(block, newline="\n")
+            if hasattr(matcher, "block_size"):
+                lines = self.blocks(lines, matcher.block_size)
+            with self.stats.phase("scan"):
+                for line in lines:
+                    matcher.find_match(line, self.case_insensitive)
+            self.stats.count_fail_traversals(matcher)
+
+            if self.lines and not self.counter:
+                # a block begins inside a line only after a line
+                # longer than block_size
+                first_line = self.line_index.locate(start)[0]
+                self.line_index.add(block)
+
+                if self.context:
+                    self.__results = matcher.results
+                    self.collect_context(block.split("\n"), first_line,
+                                         start)
+            start += len(block)
+
+            # counts are always printed at the end of the stream,
+            # only json needs the indices until then
+            if self.counter:
+                matcher.clear_results()
+                continue
+            if self.json:
+                continue
+
+            # flush the indices found in this block
+            self.__results = matcher.results
+            if self.__results:
+                with self.stats.phase("output"):
+                    self.write_results(self.out)
+                    self.out.flush()
+            matcher.clear_results()
+
+            # lines and context of this block are not needed anymore
+            self.line_index.discard()
+            self.context_lines = {}
+
+        if self.json or self.counter:
+            self.__results = matcher.results
+
+            if self.counter:
+                self.__results = matcher.counts
+
+            if self.__results:
+                self.output(self.input[0])
 
     def run(self):
         """
@@ -377,17 +1075,42 @@ class StringMatcher():
         it calls the appropriate function to process it
         """
         # FILE INPUT
-        if self.text_type == "file":
+        if self.text_type == "file" and self.suffix_array_path is not None:
+            self.process_suffix_array()
+
+        elif self.text_type == "file":
             self.process_files()
 
+        # STANDARD INPUT
+        elif self.text_type == "stdin":
+            self.process_stdin(self.block_size)
+
         # STRING INPUT
         else:
             self.process_strings()
 
+        # unmap the automaton file
+        if self.compiled_automaton is not None:
+            self.compiled_automaton.close()
+
         if self.json:
             self.save_json()
 
+        if self.skipped:
+            print("\nThe following binary file(s) were skipped:")
+            for skipped in self.skipped:
+                print(f"\t{skipped}")
+
         if self.errors:
             print("\nThe following file(s) could not be opened:")
             for error in self.errors:
                 print(f"\t{error}")
+
+        if self.stats.enabled:
+            self.stats.report(self.stats_style)
+
+        if self.cache is not None and self.cache_stats:
+            self.cache.report()
+
+        if self.heavy_hitters is not None:
+            self.heavy_hitters.report()
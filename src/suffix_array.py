@@ -0,0 +1,337 @@
+"""
+SuffixArray is an index of one large text: the start of every suffix
+of the text, sorted. All the occurrences of a pattern are the suffixes
+beginning with it, a contiguous range of the array which is found with
+two binary searches (O(m log n) for a pattern of length m), so many
+queries on the same text do not scan it again.
+The array is kept in a compact buffer (numpy if installed, otherwise
+the array module) and can be saved to disk next to the text.
+"""
+
+from array import array
+import hashlib
+import json
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class SuffixArray:
+
+    magic = b"SMSA1\n"
+
+    def __init__(self, text, lcp=False, suffixes=None, lcp_array=None):
+        self.text = text
+        self.suffixes = suffixes
+        if suffixes is None:
+            self.suffixes = self.build(text)
+        self.lcp = lcp_array
+        if lcp and lcp_array is None:
+            self.lcp = self.build_lcp(text, self.suffixes)
+
+    @staticmethod
+    def typecode(length):
+        # 4 bytes for each suffix while the offsets fit
+        if length < 2**31:
+            return "i"
+        return "q"
+
+    @classmethod
+    def buffer(cls, values, length):
+        """
+        store a list of offsets in the compact buffer
+        """
+        if np is not None:
+            return np.array(values, dtype=cls.typecode(length))
+        return array(cls.typecode(length), values)
+
+    @classmethod
+    def build(cls, text):
+        """
+        prefix doubling: suffixes are sorted by their first 1, 2, 4...
+        charachters, the rank of the first k charachters of two
+        suffixes gives the order of their first 2k charachters.
+        With numpy every round is one vectorized sort.
+
+        Returns:
+            - suffixes (buffer): the sorted suffixes
+        """
+        length = len(text)
+        if length == 0:
+            return cls.buffer([], length)
+
+        if np is None:
+            return cls.build_python(text)
+
+        codes = np.frombuffer(text.encode("utf-32-le", "surrogatepass"),
+                              dtype=np.uint32)
+        _, rank = np.unique(codes, return_inverse=True)
+        rank = rank.astype(np.int64).reshape(-1) + 1
+        k = 1
+
+        while True:
+            # rank of the next k charachters, 0 after the end of the text
+            following = np.zeros(length, dtype=np.int64)
+            following[:length - k] = rank[k:]
+            keys = rank * (length + 1) + following
+            order = np.argsort(keys)
+
+            sorted_keys = keys[order]
+            new_rank = np.empty(length, dtype=np.int64)
+            new_rank[order] = np.cumsum(np.concatenate(
+                ([1], sorted_keys[1:] != sorted_keys[:-1])))
+            rank = new_rank
+
+            # all suffixes have a different rank: the order is final
+            if rank.max() == length or k >= length:
+                return order.astype(cls.typecode(length))
+            k *= 2
+
+    @classmethod
+    def build_python(cls, text):
+        """
+        prefix doubling without numpy (slower, for small texts)
+        """
+        length = len(text)
+        rank = [ord(char) for char in text]
+        suffixes = list(range(length))
+        k = 1
+
+        while True:
+            keys = [(rank[i], rank[i + k] if i + k < length else -1)
+                    for i in range(length)]
+            suffixes.sort(key=keys.__getitem__)
+
+            new_rank = [0] * length
+            for previous, suffix in zip(suffixes, suffixes[1:]):
+                new_rank[suffix] = (new_rank[previous]
+                                    + (keys[suffix] != keys[previous]))
+            rank = new_rank
+
+            if rank[suffixes[-1]] == length - 1 or k >= length:
+                return cls.buffer(suffixes, length)
+            k *= 2
+
+    @classmethod
+    def build_lcp(cls, text, suffixes):
+        """
+        Kasai's algorithm: lcp[i] is the length of the longest common
+        prefix of the suffixes i - 1 and i of the array (lcp[0] = 0).
+        Suffixes are visited in text order, the common prefix of the
+        next one is at most one charachter shorter.
+        """
+        length = len(text)
+        suffixes = list(suffixes)
+        rank = [0] * length
+        for i, suffix in enumerate(suffixes):
+            rank[suffix] = i
+
+        lcp = [0] * length
+        common = 0
+        for suffix in range(length):
+            i = rank[suffix]
+            if i == 0:
+                common = 0
+                continue
+
+            previous = suffixes[i - 1]
+            while (suffix + common < length and previous + common < length
+                   and text[suffix + common] == text[previous + common]):
+                common += 1
+            lcp[i] = common
+            if common:
+                common -= 1
+
+        return cls.buffer(lcp, length)
+
+    def bounds(self, pattern):
+        """
+        range of the suffixes beginning with the pattern
+
+        Returns:
+            - (first, last): the suffixes first to last - 1 begin with
+                the pattern
+        """
+        text = self.text
+        suffixes = self.suffixes
+        size = len(pattern)
+
+        low, high = 0, len(suffixes)
+        while low < high:
+            middle = (low + high) // 2
+            start = suffixes[middle]
+            if text[start:start + size] < pattern:
+                low = middle + 1
+            else:
+                high = middle
+        first = low
+
+        high = len(suffixes)
+        while low < high:
+            middle = (low + high) // 2
+            start = suffixes[middle]
+            if text[start:start + size] <= pattern:
+                low = middle + 1
+            else:
+                high = middle
+
+        return first, low
+
+    def count(self, pattern):
+        first, last = self.bounds(pattern)
+        return last - first
+
+    def offsets(self, pattern):
+        """
+        sorted offsets of all the occurrences of the pattern
+        """
+        first, last = self.bounds(pattern)
+        return sorted(self.suffixes[first:last].tolist())
+
+    def search(self, patterns, counter=False):
+        """
+        results and counts in the same form (and order) as the
+        automaton: patterns ordered by the end of their first match
+        (longer patterns first), the same pattern given twice is
+        reported twice
+
+        Parameters:
+            - patterns (list): the patterns
+            - counter (bool): if true, offsets are not collected
+
+        Returns:
+            - results (dict): pattern -> list of offsets
+            - counts (dict): pattern -> number of matches
+        """
+        repeats = {}
+        for pattern in patterns:
+            repeats[pattern] = repeats.get(pattern, 0) + 1
+
+        found = []
+        for pattern in repeats:
+            if not pattern:
+                continue
+            first, last = self.bounds(pattern)
+            if first == last:
+                continue
+
+            if counter:
+                offsets = None
+                suffixes = self.suffixes[first:last]
+                if np is not None:
+                    start = int(suffixes.min())
+                else:
+                    start = min(suffixes)
+            else:
+                offsets = self.offsets(pattern)
+                start = offsets[0]
+            found.append((start + len(pattern), -len(pattern), pattern,
+                          first, last, offsets))
+
+        results = {}
+        counts = {}
+        for _, _, pattern, first, last, offsets in sorted(found):
+            counts[pattern] = (last - first) * repeats[pattern]
+            if offsets is not None:
+                results[pattern] = [offset for offset in offsets
+                                    for _ in range(repeats[pattern])]
+        return results, counts
+
+    def longest_repeat(self):
+        """
+        the longest substring which occurs at least twice (needs lcp)
+        """
+        if self.lcp is None or len(self.lcp) == 0:
+            return ""
+        i = max(range(len(self.lcp)), key=self.lcp.__getitem__)
+        start = self.suffixes[i]
+        return self.text[start:start + self.lcp[i]]
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")) \
+            .hexdigest()
+
+    def save(self, path):
+        """
+        write a header (json) and the raw buffers of the array and,
+        if it was built, of the lcp
+        """
+        header = {
+            "length": len(self.text),
+            "digest": self.digest(self.text),
+            "typecode": self.typecode(len(self.text)),
+            "byteorder": sys.byteorder,
+            "lcp": self.lcp is not None
+        }
+        with open(path, "wb") as index_file:
+            index_file.write(self.magic)
+            index_file.write(json.dumps(header).encode("utf-8") + b"\n")
+            index_file.write(self.suffixes.tobytes())
+            if self.lcp is not None:
+                index_file.write(self.lcp.tobytes())
+
+    @classmethod
+    def load(cls, path, text):
+        """
+        read a suffix array saved by save
+
+        Returns:
+            - SuffixArray, None if the file is not an index of the text
+        """
+        with open(path, "rb") as index_file:
+            if index_file.readline() != cls.magic:
+                return None
+            header = json.loads(index_file.readline())
+            if (header["length"] != len(text)
+                    or header["byteorder"] != sys.byteorder
+                    or header["digest"] != cls.digest(text)):
+                return None
+
+            data = index_file.read()
+
+        buffers = []
+        size = array(header["typecode"]).itemsize * len(text)
+        for i in range(1 + header["lcp"]):
+            chunk = data[i * size:(i + 1) * size]
+            if np is not None:
+                buffers.append(np.frombuffer(chunk,
+                                             dtype=header["typecode"]))
+            else:
+                buffers.append(array(header["typecode"], chunk))
+
+        lcp_array = buffers[1] if header["lcp"] else None
+        return cls(text, suffixes=buffers[0], lcp_array=lcp_array)
+
+    def statistics(self):
+        """
+        size of the index
+
+        Returns:
+            - statistics (dict): number of suffixes, bytes of the
+                buffers and (with lcp) the longest repeated substring
+        """
+        size = len(self.suffixes) * self.suffixes.itemsize
+        if self.lcp is not None:
+            size += len(self.lcp) * self.lcp.itemsize
+
+        statistics = {"suffixes": len(self.suffixes), "index bytes": size}
+        if self.lcp is not None:
+            statistics["longest repeat"] = len(self.longest_repeat())
+        return statistics
+
+
+if __name__ == "__main__":
+    text = "ushers and his heroes share the shore"
+    patterns = ["he", "she", "his", "hers", "sh"]
+
+    s = SuffixArray(text, lcp=True)
+    results, counts = s.search(patterns)
+
+    print(f"Text: {text}")
+    for key in results:
+        print(f"{key:<10}{counts[key]:<4}{results[key]}")
+    print(f"Longest repeated substring: {s.longest_repeat()!r}")
@@ -0,0 +1,334 @@
+"""
+TrigramIndex maps each trigram (three consecutive charachters,
+casefolded) of a corpus to the files which contain it. A pattern can
+only be found in the files which contain all its trigrams: before
+searching a large corpus, StringMatcher asks the index which files
+can contain a pattern and runs the matcher only on them.
+Posting lists are sorted lists of file ids, kept as varint encoded
+differences and saved in a SQLite database (only when the index
+changed). Files which changed are indexed again with a new id, the old
+id is only marked as deleted (and dropped when the index is compacted).
+"""
+
+import os
+import sqlite3
+import sys
+
+from src.file_reader import FileReader
+
+
+class TrigramIndex:
+
+    # indices saved with another version are built again
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        # file id -> (path, size, modification time), None if deleted
+        self.files = []
+        # path -> file id
+        self.ids = {}
+        # trigram -> encoded posting list (bytes, bytearray while new
+        # ids are appended) and last id of the list
+        self.postings = {}
+        self.last = {}
+        # ids of the files with binary members, always searched
+        self.always = set()
+        self.deleted = 0
+        # the index changed since it was loaded: save writes it
+        self.dirty = not os.path.isfile(path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        load an index from disk, or create an empty one
+        if the file does not exist
+        """
+        index = cls(path)
+        if not os.path.isfile(path):
+            return index
+
+        connection = sqlite3.connect(path)
+        try:
+            if (connection.execute("PRAGMA user_version").fetchone()[0]
+                    != cls.version):
+                index.dirty = True
+                return index
+
+            for file_id, *entry, always in connection.execute(
+                    "SELECT id, path, size, mtime, always FROM files "
+                    "ORDER BY id"):
+                # deleted files have no path
+                index.files.append(tuple(entry) if entry[0] else None)
+                if always:
+                    index.always.add(file_id)
+
+            for trigram, last, posting in connection.execute(
+                    "SELECT trigram, last, ids FROM postings"):
+                index.postings[trigram] = posting
+                index.last[trigram] = last
+        finally:
+            connection.close()
+
+        index.ids = {entry[0]: i for i, entry in enumerate(index.files)
+                     if entry is not None}
+        index.deleted = index.files.count(None)
+        return index
+
+    def save(self):
+        """
+        write the whole index in the database, only if it changed
+        """
+        if not self.dirty:
+            return
+
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY "
+                    "KEY, path TEXT, size INTEGER, mtime INTEGER, "
+                    "always INTEGER)")
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS postings (trigram TEXT "
+                    "PRIMARY KEY, last INTEGER, ids BLOB)")
+                connection.execute(f"PRAGMA user_version = {self.version}")
+                connection.execute("DELETE FROM files")
+                connection.execute("DELETE FROM postings")
+
+                connection.executemany(
+                    "INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                    ((file_id, *(entry or (None, None, None)),
+                      file_id in self.always)
+                     for file_id, entry in enumerate(self.files)))
+                connection.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    ((trigram, self.last[trigram], bytes(posting))
+                     for trigram, posting in self.postings.items()))
+        finally:
+            connection.close()
+        self.dirty = False
+
+    @staticmethod
+    def encode(ids):
+        """
+        encode a sorted list of ids as differences, each difference
+        is a varint (7 bits for each byte, high bit = more bytes)
+        """
+        encoded = bytearray()
+        previous = 0
+        for file_id in ids:
+            delta = file_id - previous
+            previous = file_id
+            while delta >= 0x80:
+                encoded.append((delta & 0x7f) | 0x80)
+                delta >>= 7
+            encoded.append(delta)
+        return bytes(encoded)
+
+    @staticmethod
+    def decode(encoded):
+        ids = []
+        previous = 0
+        delta = 0
+        shift = 0
+        for byte in encoded:
+            delta |= (byte & 0x7f) << shift
+            if byte & 0x80:
+                shift += 7
+                continue
+            previous += delta
+            ids.append(previous)
+            delta = 0
+            shift = 0
+        return ids
+
+    @staticmethod
+    def trigrams(text):
+        # casefold maps each charachter on its own (lower depends on
+        # the position: a final Σ becomes ς), so the trigrams of a
+        # pattern are always found in the texts which contain it
+        text = text.casefold()
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def file_key(filepath):
+        status = os.stat(filepath)
+        return os.path.abspath(filepath), status.st_size, status.st_mtime_ns
+
+    def file_trigrams(self, filepath):
+        """
+        trigrams of all text members of a file, lines are
+        searched on their own so newlines are not part of them
+
+        Returns:
+            - trigrams (set), None if the file has binary members
+                (they are reported as skipped, so always searched)
+        """
+        trigrams = set()
+        for _, text in FileReader(filepath).text_members():
+            if text is None:
+                return None
+            for line in text:
+                trigrams |= self.trigrams(line.rstrip("\n"))
+        return trigrams
+
+    def add_file(self, filepath):
+        """
+        index a new file (or a file which changed): the file gets a new
+        id, which is larger than all the others, so the new id is
+        simply appended to the posting lists
+        """
+        key = self.file_key(filepath)
+        trigrams = self.file_trigrams(filepath)
+
+        self.remove_file(key[0])
+        self.dirty = True
+        file_id = len(self.files)
+        self.files.append(key)
+        self.ids[key[0]] = file_id
+
+        if trigrams is None:
+            self.always.add(file_id)
+            return
+
+        for trigram in trigrams:
+            posting = self.postings.get(trigram)
+            # lists read from disk are copied once, then extended
+            if not isinstance(posting, bytearray):
+                posting = bytearray(posting or b"")
+                self.postings[trigram] = posting
+            posting += self.encode([file_id - self.last.get(trigram, 0)])
+            self.last[trigram] = file_id
+
+    def remove_file(self, path):
+        file_id = self.ids.pop(path, None)
+        if file_id is not None:
+            self.files[file_id] = None
+            self.always.discard(file_id)
+            self.deleted += 1
+            self.dirty = True
+
+    def update(self, filepaths):
+        """
+        bring the index up to date for a list of files: new or modified
+        files are indexed, files which do not exist anymore are removed.
+        Unchanged files only cost a stat.
+
+        Parameters:
+            - filepaths (list): the files of the corpus
+
+        Returns:
+            - updated (int): number of files indexed again
+        """
+        updated = 0
+        for filepath in filepaths:
+            path = os.path.abspath(filepath)
+            if not os.path.isfile(path):
+                self.remove_file(path)
+                continue
+
+            file_id = self.ids.get(path)
+            if file_id is None or self.files[file_id] != self.file_key(path):
+                try:
+                    self.add_file(path)
+                    updated += 1
+                # unreadable files are not indexed, so always searched
+                except Exception:
+                    self.remove_file(path)
+
+        if self.deleted > len(self.files) // 2:
+            self.compact()
+
+        return updated
+
+    def compact(self):
+        """
+        drop the deleted ids and renumber the files
+        """
+        new_ids = {}
+        files = []
+        for file_id, entry in enumerate(self.files):
+            if entry is not None:
+                new_ids[file_id] = len(files)
+                files.append(entry)
+
+        postings = {}
+        last = {}
+        for trigram, posting in self.postings.items():
+            ids = [new_ids[i] for i in self.decode(posting) if i in new_ids]
+            if ids:
+                postings[trigram] = self.encode(ids)
+                last[trigram] = ids[-1]
+
+        self.files = files
+        self.postings = postings
+        self.last = last
+        self.always = {new_ids[i] for i in self.always}
+        self.ids = {entry[0]: i for i, entry in enumerate(files)}
+        self.deleted = 0
+        self.dirty = True
+
+    def pattern_files(self, pattern):
+        """
+        ids of the files which contain all trigrams of a pattern,
+        None if the pattern is too short to use the index
+        """
+        trigrams = self.trigrams(pattern)
+        if not trigrams:
+            return None
+
+        # start from the shortest posting list
+        postings = sorted((self.postings.get(t, b"") for t in trigrams),
+                          key=len)
+        candidates = set(self.decode(postings[0]))
+        for posting in postings[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(self.decode(posting))
+        return candidates
+
+    def candidates(self, filepaths, patterns):
+        """
+        keep the files which can contain at least one pattern.
+        Files which are not indexed (or changed) are always kept.
+
+        Parameters:
+            - filepaths (list): the files to be searched
+            - patterns (list): the patterns
+
+        Returns:
+            - set of the files (as given) to be searched
+        """
+        candidates = set(self.always)
+        for pattern in patterns:
+            ids = self.pattern_files(pattern)
+            if ids is None:
+                return set(filepaths)
+            candidates |= ids
+
+        selected = set()
+        for filepath in filepaths:
+            path = os.path.abspath(filepath)
+            file_id = self.ids.get(path)
+            if (file_id is None or file_id in candidates
+                    or self.files[file_id] != self.file_key(path)):
+                selected.add(filepath)
+        return selected
+
+
+if __name__ == "__main__":
+    # build or update the index of a directory:
+    # python -m src.trigram_index DIRECTORY INDEX
+    directory, index_path = sys.argv[1:3]
+
+    filepaths = []
+    for path, _, files in os.walk(directory):
+        for filename in files:
+            filepaths.append(os.path.join(path, filename))
+
+    index = TrigramIndex.load(index_path)
+    updated = index.update(filepaths)
+    index.save()
+    print(f"{updated} file(s) indexed, {len(index.ids)} file(s) "
+          f"and {len(index.postings)} trigrams in {index_path}")
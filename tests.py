@@ -1,8 +1,35 @@
+import bz2
+from contextlib import redirect_stdout
+import gzip
+import io
+import lzma
+import os
 import re
+import tarfile
+import tempfile
+import threading
 import unittest
+from unittest import mock
+import zipfile
 
 import src.naive_matcher as nv
 import src.ahoc_automaton as ac
+import src.shift_and as sa
+import src.approximate_matcher as am
+import src.regex_matcher as rm
+import src.rabin_karp as rk
+from src.file_reader import FileReader
+from src.line_index import LineIndex
+from src.string_matcher import StringMatcher
+from src.stats import Stats
+from src.result_cache import ResultCache
+from src.trigram_index import TrigramIndex
+from src.suffix_array import SuffixArray
+from src.prefetcher import Prefetcher, PrefetchStream
+from src.compiled_automaton import CompiledAutomaton
+from src.result_spill import ResultSpill
+from src.heavy_hitters import HeavyHitterMatcher
+from fuzz_engines import fuzz
 
 """
 This file contains the tests for this projects
@@ -197,6 +224,794 @@ class Test(unittest.TestCase):
         self.assertListEqual(gold, ac_matches)
         self.assertListEqual(gold, naive_matches)
 
+    def test_binary_detection(self):
+        # binary files are recognized, text files (also empty) are not
+        contents = {
+            "text.txt": "the night is dark\n".encode("utf-8"),
+            "unicode.txt": "America’s Cup ".encode("utf-8") * 500,
+            "empty.txt": b"",
+            "nul.bin": b"%PDF-1.4\n\x00\x01\x02",
+            "random.bin": bytes(range(128, 256)) * 10
+        }
+        expected = {
+            "text.txt": False,
+            "unicode.txt": False,
+            "empty.txt": False,
+            "nul.bin": True,
+            "random.bin": True
+        }
+
+        detected = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for name, content in contents.items():
+                path = os.path.join(tmp_dir, name)
+                with open(path, "wb") as tmp_file:
+                    tmp_file.write(content)
+                members = FileReader(path).text_members()
+                _, text = next(members)
+                detected[name] = text is None
+                members.close()
+
+        self.assertDictEqual(expected, detected)
+
+    def test_binary_chunks(self):
+        # binary blocks are recognized, text blocks (also empty) are not
+        chunks = {
+            "text": "the night is dark\n".encode("utf-8"),
+            "unicode": "America’s Cup ".encode("utf-8") * 500,
+            "empty": b"",
+            "nul": b"%PDF-1.4\n\x00\x01\x02",
+            "random": bytes(range(128, 256)) * 10
+        }
+        expected = {
+            "text": False,
+            "unicode": False,
+            "empty": False,
+            "nul": True,
+            "random": True
+        }
+
+        detected = {}
+        for name, chunk in chunks.items():
+            detected[name] = FileReader.is_binary(chunk)
+
+        self.assertDictEqual(expected, detected)
+
+    def test_compressed_members(self):
+        # compressed files and archives are read like the plain text
+        string = self.__class__.strings[1]
+        pattern = self.__class__.patterns[1]
+
+        gold = [i.start() for i in re.finditer(pattern, string)]
+        ac_matches = []
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+
+            path = os.path.join(tmp_dir, "text.gz")
+            with gzip.open(path, "wt", encoding="utf-8") as gz_file:
+                gz_file.write(string)
+            paths.append(path)
+
+            path = os.path.join(tmp_dir, "text.zip")
+            with zipfile.ZipFile(path, "w") as zip_file:
+                zip_file.writestr("first.txt", string)
+                zip_file.writestr("second.txt", string)
+            paths.append(path)
+
+            for path in paths:
+                for _, text in FileReader(path).text_members():
+                    ac_matcher = ac.State.create_automaton([pattern])
+                    for line in text:
+                        ac_matcher.find_match(line)
+                    ac_matches.append(ac_matcher.results[pattern])
+
+        self.assertListEqual([gold, gold, gold], ac_matches)
+
+    def test_archive_members(self):
+        # tar (plain and compressed), bz2 and xz are read like the text
+        string = self.__class__.strings[1]
+        pattern = self.__class__.patterns[1]
+        data = string.encode("utf-8")
+
+        gold = [i.start() for i in re.finditer(pattern, string)]
+        ac_matches = []
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+
+            path = os.path.join(tmp_dir, "text.bz2")
+            with open(path, "wb") as bz2_file:
+                bz2_file.write(bz2.compress(data))
+            paths.append(path)
+
+            path = os.path.join(tmp_dir, "text.xz")
+            with open(path, "wb") as xz_file:
+                xz_file.write(lzma.compress(data))
+            paths.append(path)
+
+            for mode, extension in (("w", "tar"), ("w:gz", "tar.gz"),
+                                    ("w:bz2", "tar.bz2"),
+                                    ("w:xz", "tar.xz")):
+                path = os.path.join(tmp_dir, f"text.{extension}")
+                with tarfile.open(path, mode) as tar_file:
+                    source = os.path.join(tmp_dir, "member.txt")
+                    with open(source, "wb") as member_file:
+                        member_file.write(data)
+                    tar_file.add(source, "member.txt")
+                paths.append(path)
+
+            formats = []
+            for path in paths:
+                reader = FileReader(path)
+                formats.append(reader.file_format)
+                for _, text in reader.text_members():
+                    ac_matcher = ac.State.create_automaton([pattern])
+                    for line in text:
+                        ac_matcher.find_match(line)
+                    ac_matches.append(ac_matcher.results[pattern])
+
+        self.assertListEqual([b"BZh", b"\xfd7zXZ\x00"] + ["tar"] * 4,
+                             formats)
+        self.assertListEqual([gold] * 6, ac_matches)
+
+    def test_epub_binary_members(self):
+        # the images of an epub are skipped, its chapters are searched
+        string = self.__class__.strings[1]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "book.epub")
+            with zipfile.ZipFile(path, "w") as epub_file:
+                epub_file.writestr("mimetype", "application/epub+zip")
+                epub_file.writestr("OEBPS/chapter1.xhtml",
+                                   f"<p>{string}</p>")
+                epub_file.writestr("OEBPS/cover.png",
+                                   b"\x89PNG\r\n\x1a\n\x00\x00" * 50)
+
+            members = {member: text is None for member, text
+                       in FileReader(path).text_members()}
+
+        self.assertDictEqual({"mimetype": False,
+                              "OEBPS/chapter1.xhtml": False,
+                              "OEBPS/cover.png": True}, members)
+
+    def test_false_magic_numbers(self):
+        # a text file beginning with a magic number is still searched
+        string = "BZh is the magic number of bzip2\nBZh again"
+        gold = [i.start() for i in re.finditer("BZh", string)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "bzh.txt")
+            with open(path, "w", encoding="utf-8") as text_file:
+                text_file.write(string)
+
+            reader = FileReader(path)
+            ac_matcher = ac.State.create_automaton(["BZh"])
+            for _, text in reader.text_members():
+                for line in text:
+                    ac_matcher.find_match(line)
+
+        self.assertEqual("text", reader.file_format)
+        self.assertListEqual(gold, ac_matcher.results["BZh"])
+
+    def test_streaming_blocks(self):
+        # indices are carried across blocks even if results are cleared
+        string = "\n".join(self.__class__.strings)
+        patterns = self.__class__.patterns
+
+        gold = {}
+        for pattern in patterns:
+            result = [i.start() for i in re.finditer(pattern, string)]
+            if result:
+                gold[pattern] = result
+
+        for matcher in (nv.NaiveStringMatcher(patterns),
+                        ac.State.create_automaton(patterns)):
+            streamed = {}
+            for line in string.splitlines(keepends=True):
+                matcher.find_match(line)
+                for pattern, indices in matcher.results.items():
+                    streamed.setdefault(pattern, []).extend(indices)
+                matcher.clear_results()
+
+            self.assertDictEqual(gold, streamed)
+
+    def test_stdin_lines(self):
+        # stdin is matched line by line as a file, in small blocks:
+        # no match across lines
+        text = "xxabc\ndefxx\n" * 50
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "text.txt")
+            with open(path, "w") as f:
+                f.write(text)
+
+            for patterns, options in ((["c\nd", "abc", "def"], {}),
+                                      (["abcdef"], {"max_errors": 1})):
+                outputs = []
+                for source in ("-", path):
+                    with redirect_stdout(io.StringIO()) as output, \
+                            mock.patch("sys.stdin", io.StringIO(text)):
+                        sucher = StringMatcher(list(patterns), [source],
+                                               False, False, False, False,
+                                               True, **options)
+                        if source == "-":
+                            sucher.process_stdin(block_size=16)
+                        else:
+                            sucher.run()
+                    # the file output begins with the name of the file
+                    outputs.append(output.getvalue().split("\n", 1)[-1])
+                self.assertEqual(outputs[1], outputs[0])
+
+        # lines without a newline are cut, blocks have a bounded size
+        blocks = list(StringMatcher.stream_blocks(io.StringIO("a" * 100), 8))
+        self.assertEqual("a" * 100, "".join(blocks))
+        self.assertTrue(all(len(block) <= 16 for block in blocks))
+
+        # with counts the indices are not kept until the end
+        with redirect_stdout(io.StringIO()) as output, \
+                mock.patch("sys.stdin", io.StringIO("ab\n" * 1000)):
+            sucher = StringMatcher(["a", "b"], ["-"], False, False, False,
+                                   False, True)
+            matcher = sucher.choose_algorithm()
+            with mock.patch.object(sucher, "choose_algorithm",
+                                   return_value=matcher):
+                sucher.process_stdin(block_size=16)
+        self.assertEqual({}, {key: value for key, value
+                              in matcher.results.items() if value})
+        self.assertDictEqual({"a": 1000, "b": 1000}, matcher.counts)
+        self.assertIn("1000", output.getvalue())
+
+    def test_line_index(self):
+        # line and column of each match are the same as in the text lines
+        string = "\n".join(self.__class__.strings + ["", "th"])
+
+        gold = []
+        for number, line in enumerate(string.split("\n"), 1):
+            for i in re.finditer("th", line):
+                gold.append((number, i.start() + 1))
+
+        ac_matcher = ac.State.create_automaton(["th"])
+        index = LineIndex()
+        for line in string.splitlines(keepends=True):
+            index.add(line)
+            ac_matcher.find_match(line)
+
+        located = [index.locate(i) for i in ac_matcher.results["th"]]
+        self.assertListEqual(gold, located)
+
+    def test_automaton_statistics(self):
+        # he, she, his, hers: the example automaton from the paper
+        ac_matcher = ac.State.create_automaton(["he", "she", "his", "hers"])
+        statistics = ac_matcher.statistics()
+
+        self.assertEqual(10, statistics["states"])
+        self.assertEqual(9, statistics["transitions"])
+
+        # fail links are counted during the scan, without changing
+        # its results: she -> he on "r" of "ushers"
+        stats = Stats(enabled=True)
+        stats.watch(ac_matcher)
+        ac_matcher.find_match("ushers")
+        stats.count_fail_traversals(ac_matcher)
+        self.assertDictEqual({"she": [1], "he": [2], "hers": [2]},
+                             ac_matcher.results)
+        self.assertEqual(1, stats.fail_traversals)
+
+        # the compiled automaton follows the same fail links
+        compiled = CompiledAutomaton(CompiledAutomaton.compile(
+            ["he", "she", "his", "hers"]))
+        stats.watch(compiled)
+        compiled.find_match("ushers")
+        stats.count_fail_traversals(compiled)
+        self.assertEqual(2, stats.fail_traversals)
+
+    def test_shift_and(self):
+        # the bit parallel matcher finds overlapping and nested patterns
+        patterns = self.__class__.patterns + ["he", "hers", "ers", "e"]
+
+        for string in self.__class__.strings + ["ushers hers"]:
+            sa_matcher = sa.ShiftAndMatcher(patterns)
+            sa_matcher.find_match(string)
+
+            gold_results = {}
+            gold_counts = {}
+            for pattern in patterns:
+                a = [i.start() for i in
+                     re.finditer(f"(?={re.escape(pattern)})", string)]
+                if a:
+                    gold_results[pattern] = a
+                    gold_counts[pattern] = len(a)
+
+            self.assertDictEqual(gold_results, sa_matcher.results)
+            self.assertDictEqual(gold_counts, sa_matcher.counts)
+
+    def test_approximate_matching(self):
+        # filtered (long) and scanned (short) patterns agree with a
+        # complete dynamic programming table
+
+        def edit_distance(first, second):
+            row = list(range(len(second) + 1))
+            for i, first_char in enumerate(first, 1):
+                previous, row = row, [i] + [0] * len(second)
+                for j, second_char in enumerate(second, 1):
+                    row[j] = min(previous[j] + 1, row[j - 1] + 1,
+                                 previous[j - 1]
+                                 + (first_char != second_char))
+            return row[-1]
+        patterns = ["the beginning", "PRADA Christmas", "hydrofoil", "th"]
+        text = ("this is only the begining of the tseting, PRAD Christmas "
+                "Race, a sailing HYDROFOIL, hydrofol sailboat")
+
+        for max_errors in range(3):
+            matcher = am.ApproximateMatcher(patterns, max_errors)
+            matcher.find_match(text)
+
+            gold = {}
+            for pattern in patterns:
+                # smallest distance of a substring ending at each position
+                column = list(range(len(pattern) + 1))
+                distances = []
+                for char in text:
+                    previous = column
+                    column = [0] * (len(pattern) + 1)
+                    for i in range(1, len(pattern) + 1):
+                        column[i] = min(previous[i] + 1, column[i - 1] + 1,
+                                        previous[i - 1]
+                                        + (pattern[i - 1] != char))
+                    distances.append(column[-1])
+
+                # best end position of each group within the errors
+                ends = []
+                in_group = False
+                for j, distance in enumerate(distances):
+                    if distance > max_errors:
+                        in_group = False
+                    elif not in_group:
+                        ends.append((j, distance))
+                        in_group = True
+                    elif distance < ends[-1][1]:
+                        ends[-1] = (j, distance)
+
+                # the shortest substring ending there with that distance
+                if ends:
+                    gold[pattern] = [
+                        (next(start for start in range(j + 1, -1, -1)
+                              if edit_distance(pattern,
+                                               text[start:j + 1]) == d), d)
+                        for j, d in ends]
+
+            self.assertDictEqual(gold, matcher.results)
+
+    def test_regex_matcher(self):
+        # the trie shaped regex finds overlapping and nested patterns
+        patterns = self.__class__.patterns + ["he", "hers", "ers", "e", "."]
+
+        for string in self.__class__.strings + ["ushers hers."]:
+            regex_matcher = rm.RegexMatcher(patterns)
+            ac_matcher = ac.State.create_automaton(patterns)
+
+            regex_matcher.find_match(string)
+            ac_matcher.find_match(string)
+
+            self.assertDictEqual(ac_matcher.results, regex_matcher.results)
+            self.assertDictEqual(ac_matcher.counts, regex_matcher.counts)
+
+    @unittest.skipUnless(rk.RabinKarpMatcher.available(),
+                         "numpy is not installed")
+    def test_rabin_karp(self):
+        # windows are hashed in blocks of any length, also unicode
+        patterns = self.__class__.patterns + ["he", "hers", "’s Cup", "e"]
+        string = "\n".join(self.__class__.strings)
+
+        rk_matcher = rk.RabinKarpMatcher(patterns)
+        ac_matcher = ac.State.create_automaton(patterns)
+
+        rk_matcher.find_match(string)
+        ac_matcher.find_match(string)
+
+        self.assertDictEqual(ac_matcher.results, rk_matcher.results)
+        self.assertDictEqual(ac_matcher.counts, rk_matcher.counts)
+
+        # lone surrogates (undecodable bytes read with surrogateescape)
+        string = b"caf\xe9 \xff\xfe caf\xe9".decode("utf-8",
+                                                      "surrogateescape")
+        patterns = ["caf\udce9", "\udcff\udcfe", "e"]
+        rk_matcher = rk.RabinKarpMatcher(patterns)
+        ac_matcher = ac.State.create_automaton(patterns)
+        rk_matcher.find_match(string)
+        ac_matcher.find_match(string)
+        self.assertDictEqual(ac_matcher.results, rk_matcher.results)
+
+        # lines joined in a block match as the lines one by one,
+        # a whole string also across its lines
+        lines = ["xxabc\n", "defxx\n", "abc"]
+        patterns = ["c\nd", "abc\n", "\n", "abc"]
+        ac_matcher = ac.State.create_automaton(patterns)
+        for line in lines:
+            ac_matcher.find_match(line)
+        rk_matcher = rk.RabinKarpMatcher(patterns)
+        rk_matcher.find_match("".join(lines))
+        self.assertDictEqual(ac_matcher.results, rk_matcher.results)
+
+        ac_matcher = ac.State.create_automaton(patterns)
+        ac_matcher.find_match("".join(lines))
+        rk_matcher = rk.RabinKarpMatcher(patterns, lines=False)
+        rk_matcher.find_match("".join(lines))
+        self.assertDictEqual(ac_matcher.results, rk_matcher.results)
+        self.assertIn("c\nd", rk_matcher.results)
+
+    def test_result_cache(self):
+        # entries are valid for the same file and the same search
+        entries = [{"member": None, "results": {"th": [0, 5]},
+                    "counts": {"th": 2}}]
+        fingerprint = ResultCache.create_fingerprint(["th"], {"case": True})
+        other = ResultCache.create_fingerprint(["th"], {"case": False})
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            text_path = os.path.join(tmp_dir, "text.txt")
+            with open(text_path, "w", encoding="utf-8") as text_file:
+                text_file.write(self.__class__.strings[0])
+
+            cache = ResultCache(os.path.join(tmp_dir, "cache.sqlite"),
+                                fingerprint)
+            self.assertIsNone(cache.lookup(text_path))
+            cache.store(text_path, entries)
+            self.assertListEqual(entries, cache.lookup(text_path))
+            cache.close()
+
+            # different search
+            cache = ResultCache(os.path.join(tmp_dir, "cache.sqlite"), other)
+            self.assertIsNone(cache.lookup(text_path))
+            cache.close()
+
+            # modified file
+            with open(text_path, "a", encoding="utf-8") as text_file:
+                text_file.write("th")
+            cache = ResultCache(os.path.join(tmp_dir, "cache.sqlite"),
+                                fingerprint)
+            self.assertIsNone(cache.lookup(text_path))
+            cache.close()
+
+    def test_trigram_index(self):
+        ids = [0, 3, 200, 201, 100000]
+        self.assertListEqual(ids, TrigramIndex.decode(
+            TrigramIndex.encode(ids)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"{i}.txt") for i in range(3)]
+            for path, string in zip(paths, self.__class__.strings):
+                with open(path, "w", encoding="utf-8") as text_file:
+                    text_file.write(string)
+
+            index_path = os.path.join(tmp_dir, "index")
+            index = TrigramIndex.load(index_path)
+            self.assertEqual(3, index.update(paths))
+            index.save()
+
+            # every file containing a pattern is a candidate
+            index = TrigramIndex.load(index_path)
+            # nothing changed: the index is not written again
+            self.assertEqual(0, index.update(paths))
+            self.assertFalse(index.dirty)
+            for pattern in ["prada", "Hydro", "the ", "sail", "xyz"]:
+                expected = {path for path, string
+                            in zip(paths, self.__class__.strings)
+                            if pattern.lower() in string.lower()}
+                self.assertTrue(expected <= index.candidates(paths,
+                                                             [pattern]))
+            self.assertSetEqual(set(), index.candidates(paths, ["xyz"]))
+            # short patterns cannot use the index
+            self.assertSetEqual(set(paths), index.candidates(paths, ["x"]))
+
+            # only the modified file is indexed again
+            with open(paths[0], "a", encoding="utf-8") as text_file:
+                text_file.write(" xyz")
+            self.assertEqual(1, index.update(paths))
+            self.assertSetEqual({paths[0]}, index.candidates(paths, ["xyz"]))
+
+            # the posting lists read from disk are extended and saved
+            index.save()
+            index = TrigramIndex.load(index_path)
+            self.assertSetEqual({paths[0]}, index.candidates(paths, ["xyz"]))
+            self.assertSetEqual(set(paths[1:]),
+                                index.candidates(paths, ["prada", "sail"]))
+
+            # the trigrams do not depend on the position in the word:
+            # the final Σ of the pattern is not final in the file
+            greek = os.path.join(tmp_dir, "greek.txt")
+            with open(greek, "w", encoding="utf-8") as text_file:
+                text_file.write("ΟΔΟΣΑ\n")
+            index.update([greek])
+            self.assertSetEqual({greek}, index.candidates([greek],
+                                                          ["ΟΔΟΣ"]))
+            index.save()
+
+            # an index saved by another version is built again
+            with mock.patch.object(TrigramIndex, "version", 2):
+                index = TrigramIndex.load(index_path)
+                self.assertTrue(index.dirty)
+                self.assertEqual(4, index.update(paths + [greek]))
+                index.save()
+                self.assertFalse(TrigramIndex.load(index_path).dirty)
+
+    def test_suffix_array(self):
+        text = "\n".join(self.__class__.strings)
+        index = SuffixArray(text, lcp=True)
+        self.assertListEqual(sorted(range(len(text)), key=lambda i: text[i:]),
+                             index.suffixes.tolist())
+
+        patterns = ["th", "PRADA", "sail", "bottle", "e", "xyz"]
+        results, counts = index.search(patterns)
+        for pattern in patterns:
+            expected = [m.start() for m in re.finditer(
+                f"(?={re.escape(pattern)})", text)]
+            self.assertListEqual(expected, results.get(pattern, []))
+            self.assertEqual(len(expected), counts.get(pattern, 0))
+            self.assertEqual(len(expected), index.count(pattern))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, "index")
+            index.save(index_path)
+            loaded = SuffixArray.load(index_path, text)
+            self.assertListEqual(index.suffixes.tolist(),
+                                 loaded.suffixes.tolist())
+            self.assertEqual(index.longest_repeat(), loaded.longest_repeat())
+            # the index of another text is not loaded
+            self.assertIsNone(SuffixArray.load(index_path, text + "x"))
+
+    def test_prefetcher(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"{i}.txt") for i in range(4)]
+            for i, path in enumerate(paths):
+                with open(path, "w", encoding="utf-8") as text_file:
+                    text_file.write(self.__class__.strings[i] * i * 10)
+            paths.append(os.path.join(tmp_dir, "missing.txt"))
+
+            # blocks of 64 bytes, at most 256 bytes read ahead
+            prefetcher = Prefetcher(paths, depth=2, max_bytes=256,
+                                    block_size=64)
+            for path, (data, size, file_format) in zip(paths, prefetcher):
+                if isinstance(data, Exception):
+                    self.assertFalse(os.path.exists(path))
+                    continue
+
+                # size and format come with the data
+                self.assertEqual(os.path.getsize(path), size)
+                self.assertEqual("text", file_format)
+                if isinstance(data, PrefetchStream):
+                    data = data.read()
+                with open(path, "rb") as text_file:
+                    self.assertEqual(text_file.read(), data)
+
+            self.assertEqual(0, prefetcher.budget.used)
+
+    def test_prefetch_main_thread(self):
+        # files read ahead are not opened again by the matcher
+        string = self.__class__.strings[1]
+        calls = []
+
+        def record(function):
+            def recorded(path, *args, **kwargs):
+                if threading.current_thread() is threading.main_thread():
+                    calls.append(os.path.basename(str(path)))
+                return function(path, *args, **kwargs)
+            return recorded
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "short.txt"), "w",
+                      encoding="utf-8") as text_file:
+                text_file.write(string)
+            with open(os.path.join(tmp_dir, "long.txt"), "w",
+                      encoding="utf-8") as text_file:
+                text_file.write(string * 10000)
+            with gzip.open(os.path.join(tmp_dir, "text.gz"), "wt",
+                           encoding="utf-8") as gz_file:
+                gz_file.write(string)
+            with zipfile.ZipFile(os.path.join(tmp_dir, "text.zip"),
+                                 "w") as zip_file:
+                zip_file.writestr("member.txt", string)
+
+            outputs = []
+            for prefetch in (0, 2):
+                sucher = StringMatcher(["PRADA"], [tmp_dir], False, False,
+                                       False, False, True,
+                                       prefetch=prefetch)
+                calls.clear()
+                with mock.patch("src.file_reader.open", record(open),
+                                create=True), \
+                        mock.patch("os.path.getsize",
+                                   record(os.path.getsize)), \
+                        redirect_stdout(io.StringIO()) as output:
+                    sucher.run()
+                outputs.append(output.getvalue())
+
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertListEqual([], calls)
+
+    def test_compiled_automaton(self):
+        patterns = ["th", "the", "he", "e", "ing", "PRADA", "A", "the"]
+        text = "\n".join(self.__class__.strings)
+
+        automaton = ac.State.create_automaton(patterns)
+        automaton.find_match(text)
+
+        # same results from the shared memory and from a mapped file
+        shared = CompiledAutomaton.publish(patterns)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "automaton")
+            for matcher in [CompiledAutomaton.attach(shared.name),
+                            CompiledAutomaton.load(path, patterns)]:
+                matcher.find_match(text)
+                self.assertDictEqual(automaton.results, matcher.results)
+                self.assertListEqual(list(automaton.results),
+                                     list(matcher.results))
+                self.assertDictEqual(automaton.counts, matcher.counts)
+                matcher.close()
+        shared.close()
+        shared.unlink()
+
+        # lone surrogates (invalid utf-8) and no temporary file left
+        # when the automaton cannot be written
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "automaton")
+            matcher = CompiledAutomaton.load(path, ["\udcff", "a"])
+            matcher.find_match("a\udcffb\udcff")
+            self.assertDictEqual({"\udcff": [1, 3], "a": [0]},
+                                 matcher.results)
+            matcher.close()
+
+            with mock.patch.object(CompiledAutomaton, "compile",
+                                   side_effect=OSError("no space")):
+                with self.assertRaises(OSError):
+                    CompiledAutomaton.load(path, ["other"])
+            self.assertListEqual(["automaton"], os.listdir(tmp_dir))
+
+    def test_compiled_automaton_strings(self):
+        # the automaton file is mapped once for all the strings
+        # and unmapped at the end of the run
+        strings = self.__class__.strings
+        patterns = ["th", "the", "PRADA", "hydro"]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "automaton")
+            outputs = []
+            for automaton in (None, path):
+                sucher = StringMatcher(list(patterns), list(strings), False,
+                                       False, False, False, False,
+                                       automaton=automaton)
+                with mock.patch.object(CompiledAutomaton, "load",
+                                       wraps=CompiledAutomaton.load) as load, \
+                        redirect_stdout(io.StringIO()) as output:
+                    sucher.run()
+                outputs.append(output.getvalue())
+
+            self.assertEqual(1, load.call_count)
+            self.assertIsNone(sucher.compiled_automaton.owner)
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_result_spill(self):
+        lines = [string + "\n" for string in self.__class__.strings]
+        matchers = [
+            (ac.State.create_automaton, ["th", "e", "PRADA", "o"]),
+            (lambda patterns: am.ApproximateMatcher(patterns, 1),
+             ["bottle", "sail"])
+        ]
+
+        for create, patterns in matchers:
+            expected = create(patterns)
+            for line in lines:
+                expected.find_match(line)
+
+            # at most 3 indices in memory, checked after every line
+            matcher = create(patterns)
+            spill = ResultSpill(3)
+            spill.check_chars = 1
+            for line in lines:
+                matcher.find_match(line)
+                spill.check(matcher, line)
+
+            results = spill.collect(matcher.results)
+            self.assertListEqual(list(expected.results), list(results))
+            for pattern, indices in expected.results.items():
+                self.assertListEqual(indices, list(results[pattern]))
+                self.assertEqual(len(indices), len(results[pattern]))
+            self.assertDictEqual(expected.counts, matcher.counts)
+            spill.close()
+
+    def test_result_spill_strings(self):
+        # the indices spilled to disk are merged back for every string
+        # and for the results of every file
+        strings = ["ab" * 100000, "ba" * 100000]
+        patterns = ["a", "b", "ab"]
+
+        outputs = []
+        for result_memory in (None, 1):
+            with redirect_stdout(io.StringIO()) as output:
+                StringMatcher(list(patterns), list(strings), False, False,
+                              False, False, False,
+                              result_memory=result_memory).run()
+            outputs.append(output.getvalue())
+        self.assertEqual(outputs[0], outputs[1])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "text.txt")
+            with open(path, "w") as f:
+                f.write(("ab" * 1000 + "\n") * 100)
+
+            sucher = StringMatcher(list(patterns), [path], False, False,
+                                   False, False, False, result_memory=1)
+            self.assertEqual("file", sucher.text_type)
+            sucher.spill.max_indices = 100
+            sucher.spill.check_chars = 1
+            matcher = sucher.choose_algorithm()
+            with open(path) as f:
+                sucher.scan_text(matcher, f)
+            with redirect_stdout(io.StringIO()):
+                results, counts = sucher.collect_results(
+                    matcher, (tmp_dir, "text.txt"))
+
+            self.assertDictEqual({"a": 100000, "b": 100000, "ab": 100000},
+                                 counts)
+            for pattern, count in counts.items():
+                self.assertEqual(count, len(list(results[pattern])))
+
+    def test_heavy_hitters(self):
+        text = " ".join(self.__class__.strings) * 3
+        patterns = sorted(set(text.split())) + ["th", "e", "o"]
+
+        automaton = ac.State.create_automaton(patterns)
+        automaton.find_match(text)
+        exact = automaton.counts
+
+        # small sketch and summary: counts can only be too large
+        matcher = HeavyHitterMatcher(patterns, k=5, width=16, depth=3)
+        matcher.find_match(text)
+        matcher.flush()
+        self.assertEqual(16, len(matcher.summary.top()))
+        for pattern, count, error in matcher.summary.top():
+            self.assertLessEqual(count - error, exact[pattern])
+            self.assertLessEqual(exact[pattern], count)
+        for pattern in exact:
+            self.assertLessEqual(exact[pattern],
+                                 matcher.sketch.estimate(pattern))
+        self.assertEqual(sum(exact.values()), matcher.bounds()[0])
+
+        # large enough to be exact
+        matcher = HeavyHitterMatcher(patterns, k=5, width=4096)
+        matcher.find_match(text)
+        top = sorted(exact.items(), key=lambda item: -item[1])[:5]
+        self.assertListEqual([count for _, count in top],
+                             list(matcher.counts.values()))
+
+    def test_heavy_hitters_strings(self):
+        # one sketch for the whole run: the report covers every string
+        strings = self.__class__.strings
+        patterns = ["th", "the", "e", "PRADA", "bottle", "a"]
+
+        total = 0
+        for string in strings:
+            automaton = ac.State.create_automaton(patterns)
+            automaton.find_match(string)
+            total += sum(automaton.counts.values())
+
+        sucher = StringMatcher(list(patterns), list(strings), False, False,
+                               False, False, True, top=3, sketch_width=4,
+                               sketch_depth=2)
+        with redirect_stdout(io.StringIO()):
+            sucher.run()
+
+        report = io.StringIO()
+        sucher.heavy_hitters.report(report)
+        matches = re.search(r"matches\s+(\d+)", report.getvalue())
+        self.assertEqual(total, int(matches.group(1)))
+        # the largest error of a string is kept after the reset
+        self.assertGreater(sucher.heavy_hitters.worst[0], 0)
+
+    def test_differential_fuzzing(self):
+        # every engine and input agrees with the gold standard
+        failures, _, _ = fuzz(cases=30, seed=0, size=500)
+        self.assertListEqual([], failures)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2, buffer=True)